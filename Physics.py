@@ -3,6 +3,20 @@ import sqlite3
 import os
 import random
 import math
+import time
+import struct
+import zlib
+import threading
+import collections
+import hashlib
+import concurrent.futures
+import functools
+import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None   # Table.roll_array and ROLL_NUMPY need it
 
 ################################################################################
 # constants 
@@ -22,8 +36,70 @@ MAX_TIME = phylib.PHYLIB_MAX_TIME;
 
 MAX_OBJECTS = phylib.PHYLIB_MAX_OBJECTS;
 
+# values per ball of Table.snapshot: type, number, x, y, xvel, yvel, xacc,
+# yacc and slot
+SNAPSHOT_FIELDS = phylib.PHYLIB_SNAPSHOT_FIELDS;
+
+# values per ball of a frame row: number, x, y, type, xvel, yvel
+FRAME_FIELDS = phylib.PHYLIB_FRAME_FIELDS;
+
+# flag Table.to_bytes sets in the packed header when the table has the
+# standard cushions and holes
+PACKED_DEFAULT_LAYOUT = 1;
+
 FRAME_INTERVAL = 0.01;
 
+# frames a shot keeps before writing them to the database
+SHOT_WRITE_BATCH = 1000;
+
+# bytes of shot results Game keeps in a ShotCache before forgetting the
+# least recently used
+SHOT_CACHE_BYTES = 64 * 1024 * 1024;
+
+# bytes of frames one shot may keep for the cache while it plays; a longer
+# shot stops keeping them and is not cached, so a shot being streamed holds
+# at most this much however long it runs
+SHOT_CACHE_SHOT_BYTES = 4 * 1024 * 1024;
+
+# what a shot makes of each frame: "svg" is a whole svg document and "data"
+# is the ball numbers and positions from Table.frame_data
+SHOT_OUTPUTS = ( "svg", "data" );
+
+# time each stage of every shot Game plays (see ShotMetrics); when off
+# nothing is timed or counted
+SHOT_METRICS = True;
+SHOT_STAGES = ( "simulate", "roll", "render", "write", "cache" );
+
+# roll a shot's frames with NumPy (Table.roll_array) rather than in phylib
+# (Table.roll_frames); the two agree to within rounding
+ROLL_NUMPY = False;
+
+# sqlite settings used by Database unless it is given others (None leaves
+# sqlite's own default in place)
+DB_JOURNAL_MODE = "WAL";
+DB_SYNCHRONOUS = "NORMAL";
+JOURNAL_MODES = ( "DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF" );
+SYNCHRONOUS_MODES = ( "OFF", "NORMAL", "FULL", "EXTRA" );
+
+# how Database stores the balls of a frame: "rows" is the Ball/BallTable
+# schema, "frame" packs each frame into one blob and "shot" packs all the
+# frames of a shot into one blob. "rows" and "frame" write a shot every
+# SHOT_WRITE_BATCH frames, so its memory stays flat however long it runs;
+# "shot" has to hold the balls of every frame until the shot ends to pack
+# them, so its memory grows with the length of the shot
+DB_STORAGE = "rows";
+STORAGE_MODES = ( "rows", "frame", "shot" );
+
+# bytes per float in a packed blob (4 is float32, 8 is float64)
+BLOB_PRECISION = 4;
+BLOB_DELTA = True;
+
+# the database file, how many idle connections to it are kept for reuse and
+# how many compiled statements each connection keeps
+DB_PATH = "phylib.db";
+DB_POOL_SIZE = 4;
+DB_STATEMENT_CACHE = 128;
+
 HEADER = """<?xml version="1.0" encoding="UTF-8" standalone="no"?>
 <!DOCTYPE svg PUBLIC "-//W3C//DTD SVG 1.1//EN"
 "http://www.w3.org/Graphics/SVG/1.1/DTD/svg11.dtd">
@@ -57,6 +133,10 @@ BALL_COLOURS = [
     "SANDYBROWN",       # no LIGHTBROWN 
     ];
 
+# the svg circle of each ball, with only its position left to fill in
+BALL_CIRCLES = [ """ <circle cx="%%d" cy="%%d" r="%d" fill="%s" />\n""" % ( BALL_RADIUS, colour )
+                 for colour in BALL_COLOURS ];
+
 ################################################################################
 class Coordinate( phylib.phylib_coord ):
     """
@@ -192,6 +272,14 @@ class Table( phylib.phylib_table ):
         phylib.phylib_table.__init__( self );
         self.current = -1;
 
+        # a new table has the standard cushions and holes, whose svg is
+        # shared by every table that still has them
+        self.static_layer = None;
+        self.default_layout = True;
+
+    # the svg of the standard cushions and holes once one table has made it
+    default_static_layer = None;
+
     def __iadd__( self, other ):
         """
         += operator overloading method.
@@ -199,8 +287,91 @@ class Table( phylib.phylib_table ):
         to the table.
         """
         self.add_object( other );
+
+        # anything but a ball changes the cushions and holes drawn
+        if other.type not in ( phylib.PHYLIB_STILL_BALL, phylib.PHYLIB_ROLLING_BALL ):
+            self.static_layer = None;
+            self.default_layout = False;
         return self;
 
+    @staticmethod
+    def from_frame( frame, time=0.0 ):
+        """
+        Returns a Table at the given time with the standard cushions and
+        holes and the balls of frame rows (number, x, y, type, xvel, yvel),
+        as roll_frames gives them, added in one call into phylib (see
+        phylib_add_balls). Rolling balls get drag against their velocity.
+        """
+        table = Table();
+        table.time = time;
+        table.add_balls( frame );
+        return table;
+
+    @staticmethod
+    def from_arrays( numbers, positions, velocities=None, time=0.0 ):
+        """
+        Returns a Table at the given time with the standard cushions and
+        holes and a ball for each of numbers at the (x, y) of the same index
+        in positions, built in one call into phylib. A ball whose (xvel, yvel)
+        in velocities is not zero is rolling, with drag against its velocity;
+        the rest, and all of them without velocities, are still. NumPy arrays
+        are packed without a Python loop.
+        """
+        if numpy is not None and isinstance( positions, numpy.ndarray ):
+            rows = numpy.zeros( ( len( positions ), FRAME_FIELDS ) );
+            rows[:, 0] = numbers;
+            rows[:, 1:3] = positions;
+            if velocities is not None:
+                rows[:, 4:6] = velocities;
+                rows[:, 3] = numpy.where( ( rows[:, 4:6] != 0.0 ).any( axis=1 ),
+                                          phylib.PHYLIB_ROLLING_BALL, phylib.PHYLIB_STILL_BALL );
+        else:
+            rows = array.array( "d" );
+            for i, number in enumerate( numbers ):
+                xpos, ypos = positions[i];
+                xvel, yvel = velocities[i] if velocities is not None else ( 0.0, 0.0 );
+                rolling = xvel != 0.0 or yvel != 0.0;
+                rows.extend( ( number, xpos, ypos,
+                               phylib.PHYLIB_ROLLING_BALL if rolling else phylib.PHYLIB_STILL_BALL,
+                               xvel, yvel ) );
+        return Table.from_frame( rows, time );
+
+    def to_bytes( self ):
+        """
+        Returns the table packed in one call into phylib (see
+        phylib_pack_table): its time and every occupied slot with the
+        object's exact values, a few hundred bytes for a racked table.
+        """
+        return self.pack( PACKED_DEFAULT_LAYOUT if getattr( self, "default_layout", False ) else 0 );
+
+    @staticmethod
+    def from_bytes( data ):
+        """
+        Returns the Table that to_bytes packed into data, any bytes-like
+        object, with every object in the same slot and bit for bit the same.
+        Raises ValueError if data is not a packed table.
+        """
+        table = Table();
+        flags = table.unpack( data );
+        table.default_layout = bool( flags & PACKED_DEFAULT_LAYOUT );
+        return table;
+
+    def __reduce__( self ):
+        """
+        Pickles the table as its to_bytes, so tables can go through
+        multiprocessing queues and caches without rebuilding them object by
+        object.
+        """
+        return ( Table.from_bytes, ( self.to_bytes(), ) );
+
+    def keep_layout( self, other ):
+        """
+        Gives other, a table phylib made from this one, the cached svg of
+        the cushions and holes, since phylib only ever moves balls.
+        """
+        other.static_layer = getattr( self, "static_layer", None );
+        other.default_layout = getattr( self, "default_layout", False );
+
     def __iter__( self ):
         """
         This method adds iterator support for the table.
@@ -254,29 +425,208 @@ class Table( phylib.phylib_table ):
             result += "  [%02d] = %s\n" % (i,obj);  # append object description
         return result;  # return the string
 
-    def segment( self ):
+    def strike( self, xvel, yvel ):
+        """
+        Sets the cue ball rolling with the given velocity, putting a new cue
+        ball on the table first if it has been pocketed, and returns it.
+        Raises TypeError or ValueError, leaving the table as it was, if the
+        velocity is not two finite numbers.
+        """
+        # checked before the table changes, so a bad velocity can not leave
+        # the cue ball half made into a rolling ball
+        xvel = float(xvel)
+        yvel = float(yvel)
+        if not (math.isfinite(xvel) and math.isfinite(yvel)):
+            raise ValueError("The cue ball's velocity must be finite")
+
+        cue_ball = self.cueBall()  # find the cue ball object on the table
+
+        if cue_ball is None:
+            print("Making cue ball again.")
+            # If the cue ball does not exist, recreate it at the center
+            xpos = TABLE_WIDTH / 2.0 + random.uniform(-3.0, 3.0)
+            ypos = TABLE_LENGTH - TABLE_WIDTH / 2.0
+            pos = Coordinate(xpos, ypos)
+            rb = StillBall(0, pos)  # it is set rolling below
+            self += rb
+            cue_ball = self.cueBall()  # the table keeps its own copy of the ball
+            print("Cue ball returned to center.")
+        else:
+            # If the cue ball exists, retrieve its position
+            xpos = cue_ball.obj.still_ball.pos.x
+            ypos = cue_ball.obj.still_ball.pos.y
+
+        # update the cue ball's state to a rolling ball with the given velocity
+        cue_ball.type = phylib.PHYLIB_ROLLING_BALL
+        
+        cue_ball.obj.rolling_ball.number = 0
+        
+        cue_ball.obj.rolling_ball.pos.x = xpos
+        cue_ball.obj.rolling_ball.pos.y = ypos
+        
+        cue_ball.obj.rolling_ball.vel.x = xvel
+        cue_ball.obj.rolling_ball.vel.y = yvel
+
+        # drag slows the ball against its velocity
+        xacc = 0.0
+        yacc = 0.0
+        velspeed = phylib.phylib_length(Coordinate(xvel, yvel))
+        if velspeed > VEL_EPSILON:
+            xacc = (-(xvel) / velspeed) * DRAG
+            yacc = (-(yvel) / velspeed) * DRAG
+
+        cue_ball.obj.rolling_ball.acc.x = xacc
+        cue_ball.obj.rolling_ball.acc.y = yacc
+
+        return cue_ball
+
+    def copy( self ):
+        """
+        Returns a copy of the table as a Table object.
+        """
+        result = phylib.phylib_table.copy( self );
+        result.__class__ = Table;
+        result.current = -1;
+        self.keep_layout( result );
+        return result;
+
+    def segment( self, stepped=False ):
         """
         Calls the segment method from phylib.i (which calls the phylib_segment
         functions in phylib.c.
         Sets the __class__ of the returned phylib_table object to Table
         to make it a Table object.
+        With stepped=True the fixed-step reference simulation
+        (phylib_segment_stepped) is used instead of the event-driven one.
         """
 
-        result = phylib.phylib_table.segment( self );
+        if stepped:
+            result = phylib.phylib_table.segment_stepped( self );
+        else:
+            result = phylib.phylib_table.segment( self );
         if result:
             result.__class__ = Table;
             result.current = -1;
+            self.keep_layout( result );
         return result;
     
+    def simulate( self, max_events=0 ):
+        """
+        Runs the whole shot inside phylib (see phylib_simulate_shot) and
+        returns the list of tables at each event, in order, as Table
+        objects. max_events caps the number of events, 0 means no cap.
+        """
+
+        events = phylib.phylib_table.simulate( self, max_events );
+        for event in events:
+            event.__class__ = Table;
+            event.current = -1;
+            self.keep_layout( event );
+        return events;
+
     def svg(self):
-        content = [HEADER]
-        for obj in self: # iterates over table
-            if obj: # ib object is not none 
-                output = obj.svg() # calls svg method
-                content.append(output) # appends result to list
-            
+        # the balls come from one snapshot of the table, drawn over the
+        # cached cushions and holes
+        content = [self.static_svg()]
+        for row in self.snapshot().tolist():
+            content.append(BALL_CIRCLES[int(row[1])] % (row[2], row[3]))
+
         content.append(FOOTER)
-        return "".join(content) # puts it together into one string
+        return "".join(content)
+
+    def static_svg( self ):
+        """
+        Returns the start of this table's svg without the balls: the header,
+        cushions and holes. Balls drawn after it and FOOTER complete it.
+        It is made once and kept, as only balls move.
+        """
+        layer = getattr( self, "static_layer", None );
+        if layer is not None:
+            return layer;
+
+        default = getattr( self, "default_layout", False );
+        if default and Table.default_static_layer is not None:
+            layer = Table.default_static_layer;
+        else:
+            content = [HEADER]
+            for i in range( MAX_OBJECTS ):
+                obj = self[i];
+                if obj and obj.type not in (phylib.PHYLIB_STILL_BALL, phylib.PHYLIB_ROLLING_BALL):
+                    content.append(obj.svg())
+            layer = "".join(content)
+            if default:
+                Table.default_static_layer = layer;
+
+        self.static_layer = layer;
+        return layer;
+
+    def frame_svg( self, frame ):
+        """
+        Returns the same svg as svg() would for a table holding this table's
+        cushions and holes and the balls of one frame from roll_frames
+        (a list of [number, x, y, type, xvel, yvel] rows).
+        """
+        content = [self.static_svg()]
+        for number, x, y, _, _, _ in frame:
+            content.append(BALL_CIRCLES[int(number)] % (x, y))
+
+        content.append(FOOTER)
+        return "".join(content)
+
+    def frame_data( self, frame ):
+        """
+        Returns one frame from roll_frames as a flat list of whole numbers,
+        number, x, y for each ball, rounded the way svg() draws them.
+        """
+        data = []
+        for number, x, y, _, _, _ in frame:
+            data.extend( ( int( number ), int( x ), int( y ) ) )
+        return data
+
+    def roll_array( self, times ):
+        """
+        Does what roll_frames does with NumPy: returns an array shaped
+        (frames, balls, 6) of number, x, y, type, xvel, yvel with the table
+        rolled to every time in times. The balls are read from the table
+        once and every frame is worked out at once, with phylib_roll's
+        stopping of a velocity that changes sign.
+        """
+        if numpy is None:
+            raise ImportError( "Table.roll_array needs numpy" );
+
+        numbers, types, state = [], [], [];
+        for i in range( MAX_OBJECTS ):
+            ball = self[i];
+            if ball is None:
+                continue;
+            if ball.type == phylib.PHYLIB_ROLLING_BALL:
+                rolling = ball.obj.rolling_ball;
+                numbers.append( rolling.number );
+                state.append( ( rolling.pos.x, rolling.pos.y, rolling.vel.x, rolling.vel.y,
+                                rolling.acc.x, rolling.acc.y ) );
+            elif ball.type == phylib.PHYLIB_STILL_BALL:
+                still = ball.obj.still_ball;
+                numbers.append( still.number );
+                state.append( ( still.pos.x, still.pos.y, 0.0, 0.0, 0.0, 0.0 ) );
+            else:
+                continue;
+            types.append( ball.type );
+
+        times = numpy.asarray( times, dtype=numpy.float64 ).reshape( -1, 1, 1 );
+        state = numpy.asarray( state, dtype=numpy.float64 ).reshape( -1, 6 );
+        pos, vel, acc = state[:, 0:2], state[:, 2:4], state[:, 4:6];
+
+        # the same sums as phylib_roll, in the same order
+        newVel = vel + acc * times;
+        newPos = pos + vel * times + 0.5 * acc * times * times;
+        newVel[vel * newVel < 0] = 0.0;
+
+        frames = numpy.empty( ( len( times ), len( numbers ), 6 ) );
+        frames[:, :, 0] = numbers;
+        frames[:, :, 1:3] = newPos;
+        frames[:, :, 3] = types;
+        frames[:, :, 4:6] = newVel;
+        return frames;
 
     def roll( self, t ):
         new = Table();
@@ -302,19 +652,30 @@ class Table( phylib.phylib_table ):
         return new;
 
     def cueBall(self):
-        for ball in self:
-            if ball.type == phylib.PHYLIB_STILL_BALL and ball.obj.still_ball.number == 0:
-                return ball
+        # finds the cue ball's slot in one snapshot of the balls
+        for row in self.snapshot().tolist():
+            if row[0] == phylib.PHYLIB_STILL_BALL and row[1] == 0:
+                return self[int(row[8])]
         return None  # if no cue ball is found
 
+    def pockets(self):
+        # the (x, y) of every hole, in table order
+        holes = []
+        for i in range(MAX_OBJECTS):
+            obj = self[i]
+            if obj is not None and obj.type == phylib.PHYLIB_HOLE:
+                holes.append((obj.obj.hole.pos.x, obj.obj.hole.pos.y))
+        return holes
+
     def setup_pool_table(self):
    
         # generates a small random offset so we can vary the positions slightly
         def get_random_nudge():
             return random.uniform(-1.5, 1.5)
 
-        # create a new table instance to populate with balls
-        new_table = Table()
+        # the balls are collected and the table is made with all of them at once
+        numbers = []
+        positions = []
 
         # here are total # of balls
         total_balls = 15
@@ -333,31 +694,424 @@ class Table( phylib.phylib_table ):
                 
                 y_position = TABLE_WIDTH / 2.0 + i * math.sqrt(3.0) / 2.0 * (BALL_DIAMETER + 4.0) + get_random_nudge()
 
-                # here we create a new StillBall at a calculated position
-                position = Coordinate(x_position, y_position)
-                colored_ball = StillBall(total_balls, position)
-                new_table += colored_ball
+                # here we place a still ball at the calculated position
+                numbers.append(total_balls)
+                positions.append((x_position, y_position))
                 total_balls -= 1
 
-        # add the cue ball
-        cue_ball_position = Coordinate(TABLE_WIDTH / 2.0 + random.uniform(-3.0, 3.0), TABLE_LENGTH - TABLE_WIDTH / 2.0)
-        cue_ball_velocity = Coordinate(0.0, -1000.0)  # Initial velocity of the cue ball, assuming it's hit straight on
-        cue_ball_acceleration = Coordinate(0.0, 150.0)  # Assuming some initial acceleration
-        cue_ball = StillBall(0, cue_ball_position)  # Using 0 as the id for the cue ball
-        new_table += cue_ball
+        # add the cue ball, using 0 as its number; it is still until it is struck
+        numbers.append(0)
+        positions.append((TABLE_WIDTH / 2.0 + random.uniform(-3.0, 3.0), TABLE_LENGTH - TABLE_WIDTH / 2.0))
+
+        return Table.from_arrays(numbers, positions)
+
+################################################################################
+# packed blobs
+#
+# A frame blob is a header (bytes per float, ball count) followed by one
+# fixed-width record per ball: number, type, x, y, xvel, yvel. A shot blob
+# is a header (bytes per float, flags, frame count) followed by each frame
+# as its time, ball count and records. With SHOT_DELTA everything after
+# the ball number in a record is XORed with the previous record of the same
+# ball number, so balls that have not moved are zero bytes, and the frames
+# are zlib compressed.
+
+FRAME_HEADER = struct.Struct( "<BH" );
+SHOT_HEADER = struct.Struct( "<BBI" );
+SHOT_FRAME = struct.Struct( "<dH" );
+BALL_RECORDS = { 4: struct.Struct( "<HBffff" ), 8: struct.Struct( "<HBdddd" ) };
+
+SHOT_DELTA = 1;
+NUMBER_MASK = 0xFFFF;   # the ball number, the low bytes of a record as an int
+
+def ball_record( precision ):
+    """
+    Returns the struct for a ball record with 4 or 8 bytes per float.
+    """
+    if precision not in BALL_RECORDS:
+        raise ValueError( f"Blob precision must be 4 or 8, not {precision}" );
+    return BALL_RECORDS[precision];
+
+def pack_frame( frame, precision=BLOB_PRECISION ):
+    """
+    Packs the rows of one frame (number, x, y, type, xvel, yvel, as
+    Table.roll_frames returns them) into a frame blob.
+    """
+    record = ball_record( precision );
+    data = bytearray( FRAME_HEADER.pack( precision, len( frame ) ) );
+    for number, xpos, ypos, balltype, xvel, yvel in frame:
+        data += record.pack( int( number ), int( balltype ), xpos, ypos, xvel, yvel );
+    return bytes( data );
+
+def unpack_frame( data ):
+    """
+    Unpacks a frame blob back into rows of number, x, y, type, xvel, yvel.
+    """
+    precision, count = FRAME_HEADER.unpack_from( data, 0 );
+    record = ball_record( precision );
+    frame = [];
+    for number, balltype, xpos, ypos, xvel, yvel in record.iter_unpack(
+            data[FRAME_HEADER.size:FRAME_HEADER.size + count * record.size] ):
+        frame.append( ( number, xpos, ypos, balltype, xvel, yvel ) );
+    return frame;
+
+def pack_shot( frames, precision=BLOB_PRECISION, delta=BLOB_DELTA ):
+    """
+    Packs (time, frame rows) pairs into one shot blob.
+    """
+    record = ball_record( precision );
+    previous = {};      # last record of each ball number, as an int
+    body = bytearray();
+    for frameTime, frame in frames:
+        body += SHOT_FRAME.pack( frameTime, len( frame ) );
+        for number, xpos, ypos, balltype, xvel, yvel in frame:
+            packed = record.pack( int( number ), int( balltype ), xpos, ypos, xvel, yvel );
+            if delta:
+                value = int.from_bytes( packed, "little" );
+                packed = ( value ^ previous.get( int( number ), 0 ) & ~NUMBER_MASK ).to_bytes( record.size, "little" );
+                previous[int( number )] = value;
+            body += packed;
+
+    flags = SHOT_DELTA if delta else 0;
+    if delta:
+        body = zlib.compress( bytes( body ) );
+    return SHOT_HEADER.pack( precision, flags, len( frames ) ) + bytes( body );
+
+def unpack_shot( data ):
+    """
+    Unpacks a shot blob back into a list of (time, frame rows) pairs.
+    """
+    precision, flags, count = SHOT_HEADER.unpack_from( data, 0 );
+    record = ball_record( precision );
+    body = data[SHOT_HEADER.size:];
+    if flags & SHOT_DELTA:
+        body = zlib.decompress( body );
+
+    previous = {};
+    frames = [];
+    offset = 0;
+    for i in range( count ):
+        frameTime, balls = SHOT_FRAME.unpack_from( body, offset );
+        offset += SHOT_FRAME.size;
+        frame = [];
+        for j in range( balls ):
+            packed = body[offset:offset + record.size];
+            offset += record.size;
+            if flags & SHOT_DELTA:
+                value = int.from_bytes( packed, "little" );
+                number = value & NUMBER_MASK;
+                value ^= previous.get( number, 0 ) & ~NUMBER_MASK;
+                previous[number] = value;
+                packed = value.to_bytes( record.size, "little" );
+            number, balltype, xpos, ypos, xvel, yvel = record.unpack( packed );
+            frame.append( ( number, xpos, ypos, balltype, xvel, yvel ) );
+        frames.append( ( frameTime, frame ) );
+    return frames;
+
+
+################################################################################
+class FrameSampling:
+    """
+    How Game picks the frames of a shot. Frames are FRAME_INTERVAL seconds
+    apart, or 1 / rate seconds with a rate (frames per second of the shot)
+    lower than that. With min_move a frame is only kept once some ball has
+    moved at least that far (in table units, as the svg draws them) since
+    the last frame kept, and with max_frames the frames are spread out so a
+    shot has no more than that. Either way the frame at the start of every
+    segment, the table just after a collision, is always kept. With none of
+    them, FrameSampling() is the old fixed FRAME_INTERVAL sampling: a frame
+    every FRAME_INTERVAL of each segment long enough to have one.
+    """
+
+    def __init__( self, rate=None, min_move=0.0, max_frames=0 ):
+        if rate is not None and rate <= 0:
+            raise ValueError( "Frame rate must be positive" );
+        self.rate = rate;
+        self.min_move = min_move;
+        self.max_frames = max_frames;
+        self.adaptive = bool( rate or min_move or max_frames );
+
+    def __repr__( self ):
+        return "FrameSampling(rate=%r, min_move=%r, max_frames=%r)" % ( self.rate, self.min_move, self.max_frames );
+
+    def interval( self, segments, start ):
+        """
+        Returns the seconds between frames for a shot from start with the
+        segment tables from Table.simulate.
+        """
+        interval = FRAME_INTERVAL;
+        if self.rate:
+            interval = max( interval, 1.0 / self.rate );
+        if self.max_frames and segments:
+            # the segment starts are kept, the rest of the frames share what is left
+            room = self.max_frames - len( segments );
+            duration = segments[-1].time - start;
+            interval = max( interval, duration / room ) if room > 0 else math.inf;
+        return interval;
+
+    def times( self, duration, interval ):
+        """
+        Returns the times from the start of a segment of its frames.
+        """
+        count = int( duration / interval ) if interval != math.inf else 0;
+        times = [ frame_index * interval for frame_index in range( count ) ];
+        if self.adaptive and not times:
+            times = [ 0.0 ];
+        return times;
+
+    def moved( self, previous, frame ):
+        """
+        Returns True if some ball of frame rows has moved min_move or more
+        from where previous had it, or was not in previous.
+        """
+        if not self.min_move or previous is None:
+            return True;
+        was = { row[0]: row for row in previous };
+        for row in frame:
+            before = was.get( row[0] );
+            if before is None or math.hypot( row[1] - before[1], row[2] - before[2] ) >= self.min_move:
+                return True;
+        return False;
+
+# the sampling Game uses when it is not given one
+FRAME_SAMPLING = FrameSampling();
+
+
+################################################################################
+class ShotCache:
+    """
+    Remembers the frames and final table of shots, so a shot played again
+    from the same table with the same cue velocity is served without
+    simulating or rendering it. A shot is known by a hash of every ball's
+    number, state, position and velocity and of the cue velocity; with a
+    quantum the positions and velocities are rounded to it first, so shots
+    that differ by less count as the same. The least recently used shots
+    are forgotten once the frames kept take more than budget bytes, and a
+    shot whose frames take more than shot_budget is not kept at all.
+    It may be shared between threads.
+    """
+
+    def __init__( self, budget=SHOT_CACHE_BYTES, quantum=None, shot_budget=SHOT_CACHE_SHOT_BYTES ):
+        self.budget = budget;
+        self.shot_budget = min( shot_budget, budget );
+        self.quantum = quantum;
+        self.entries = collections.OrderedDict();
+        self.lock = threading.Lock();
+        self.size = 0;
+        self.stats = { "hits": 0, "misses": 0, "evictions": 0 };
+
+    def key( self, table, xvel, yvel, output ):
+        """
+        Returns the key of a shot from the table's balls, the cue velocity
+        and the output the frames are made for.
+        """
+        rolled = table.roll_frames( [ 0.0 ] ).tolist();
+        values = [ value for row in ( rolled[0] if rolled else [] ) for value in row ];
+        values += [ xvel, yvel ];
+        if self.quantum:
+            values = [ round( value / self.quantum ) for value in values ];
+            packed = struct.pack( "<%dq" % len( values ), *values );
+        else:
+            packed = struct.pack( "<%dd" % len( values ), *values );
+        return hashlib.blake2b( packed + output.encode(), digest_size=16 ).digest();
+
+    @staticmethod
+    def frame_size( frame ):
+        # rough bytes a kept frame takes: text, or a list of small ints
+        if isinstance( frame, str ):
+            return len( frame ) + 64;
+        return 8 * len( frame ) + 64;
+
+    def get( self, key ):
+        """
+        Returns (frames, final table, duration) for a known shot, or None.
+        """
+        with self.lock:
+            entry = self.entries.get( key );
+            if entry is None:
+                self.stats["misses"] += 1;
+                return None;
+            self.entries.move_to_end( key );
+            self.stats["hits"] += 1;
+            return entry[:3];
+
+    def put( self, key, frames, table, duration, size ):
+        """
+        Keeps a shot's frames, a copy of its final table and how long it
+        took, forgetting the least recently used shots to stay in budget.
+        """
+        if size > self.shot_budget:
+            return;
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop( key )[3];
+            self.entries[key] = ( frames, table.copy(), duration, size );
+            self.size += size;
+            while self.size > self.budget:
+                _, forgotten = self.entries.popitem( last=False );
+                self.size -= forgotten[3];
+                self.stats["evictions"] += 1;
+
+    def info( self ):
+        """
+        Returns the hit, miss and eviction counts with the shots and bytes
+        kept.
+        """
+        with self.lock:
+            return dict( self.stats, entries=len( self.entries ), bytes=self.size );
+
+
+################################################################################
+class PooledConnection( sqlite3.Connection ):
+    """
+    A sqlite connection that remembers the pragmas set on it.
+    """
+    def __init__( self, *args, **kwargs ):
+        super().__init__( *args, **kwargs );
+        self.pragmas = {};
+
+
+class ConnectionPool:
+    """
+    Keeps open connections to one database file so Database objects can
+    reuse them. Taking a connection never blocks: one is opened if none is
+    idle, and at most size idle connections are kept, the rest are closed
+    when they come back. Each connection keeps its own cache of compiled
+    statements, and the schema is created once per pool. Connections may
+    move between threads but are only used by one Database at a time.
+    """
+
+    pools = {};
+    poolsLock = threading.Lock();
+
+    @classmethod
+    def shared( cls, path=DB_PATH ):
+        """
+        Returns the pool for a database file, making it the first time.
+        """
+        with cls.poolsLock:
+            if path not in cls.pools:
+                cls.pools[path] = cls( path );
+            return cls.pools[path];
+
+    def __init__( self, path=DB_PATH, size=DB_POOL_SIZE, cached_statements=DB_STATEMENT_CACHE ):
+        self.path = path;
+        self.size = size;
+        self.cached_statements = cached_statements;
+        self.idle = [];
+        self.lock = threading.Lock();
+        self.schemaReady = False;
+        self.stats = { "opened": 0, "reused": 0, "closed": 0 };
+
+    def acquire( self, pragmas ):
+        """
+        Returns an idle connection, or a new one, with the pragmas set.
+        """
+        with self.lock:
+            connection = self.idle.pop() if self.idle else None;
+            self.stats["reused" if connection else "opened"] += 1;
+        if connection is None:
+            connection = sqlite3.connect( self.path, factory=PooledConnection,
+                                          check_same_thread=False,
+                                          cached_statements=self.cached_statements );
+
+        # pragmas can not take parameters; Database only passes known values
+        for name, value in pragmas.items():
+            if value is not None and connection.pragmas.get( name ) != value:
+                connection.execute( f"PRAGMA {name} = {value};" );
+                connection.pragmas[name] = value;
+        return connection;
+
+    def release( self, connection ):
+        """
+        Takes a connection back, closing it if enough are already idle.
+        """
+        if connection.in_transaction:
+            connection.rollback();
+        with self.lock:
+            if len( self.idle ) < self.size:
+                self.idle.append( connection );
+                return;
+            self.stats["closed"] += 1;
+        connection.close();
+
+    def reset( self ):
+        """
+        Closes the idle connections and deletes the database file so the
+        next connection starts a new one. Connections still in use are not
+        touched, so this is only for start up.
+        """
+        with self.lock:
+            idle, self.idle = self.idle, [];
+            self.schemaReady = False;
+        for connection in idle:
+            connection.close();
+        # a WAL database keeps part of itself in the -wal and -shm files
+        for path in ( self.path, self.path + "-wal", self.path + "-shm" ):
+            if os.path.exists( path ):
+                os.remove( path );
 
-        return new_table
 
-        
 class Database:
     
-    # create and open a database connection to a file 
-    def __init__(self, reset=False):
-        if reset == True and os.path.exists("phylib.db"):
-            os.remove("phylib.db")
-        self.connection = sqlite3.connect("phylib.db")
+    # takes a connection to the database file from the shared pool
+    def __init__(self, reset=False, journal_mode=DB_JOURNAL_MODE, synchronous=DB_SYNCHRONOUS,
+                 storage=DB_STORAGE, precision=BLOB_PRECISION, delta=BLOB_DELTA, pool=None):
+        if storage not in STORAGE_MODES:
+            raise ValueError(f"Unknown storage mode {storage}")
+        ball_record(precision)  # checks the precision before anything is opened
+        self.storage = storage
+        self.precision = precision
+        self.delta = delta
+
+        # the first TABLEID and frames of the shot blob decoded last, so
+        # replaying a shot frame by frame unpacks it once
+        self.shotCache = (None, [])
+
+        # pragmas can not take parameters, so only known values get through
+        if journal_mode is not None and journal_mode.upper() not in JOURNAL_MODES:
+            raise ValueError(f"Unknown journal mode {journal_mode}")
+        if synchronous is not None and synchronous.upper() not in SYNCHRONOUS_MODES:
+            raise ValueError(f"Unknown synchronous setting {synchronous}")
+
+        self.pool = pool if pool is not None else ConnectionPool.shared()
+        if reset == True:
+            self.pool.reset()
+        self.connection = self.pool.acquire({
+            "journal_mode": journal_mode.upper() if journal_mode is not None else None,
+            "synchronous": synchronous.upper() if synchronous is not None else None})
+
+        # rows written by the last writeFrames call and how fast
+        self.writeStats = {"frames": 0, "rows": 0, "seconds": 0.0, "rows_per_sec": 0.0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # databases made before TableShot was keyed on TABLEID have SHOTID as its
+    # key, so only the first table of each shot could be linked; the old
+    # links are moved into a TableShot keyed on TABLEID
+    def migrateTableShot(self, current):
+        columns = current.execute("PRAGMA table_info(TableShot)").fetchall()
+        keys = [column[1].upper() for column in columns if column[5]]
+        if keys != ["SHOTID"]:
+            return
+        current.execute("DROP INDEX IF EXISTS TableShotByShot")
+        current.execute("ALTER TABLE TableShot RENAME TO TableShotOld")
+        current.execute('''CREATE TABLE TableShot(
+                            TABLEID INTEGER PRIMARY KEY,
+                            SHOTID INTEGER NOT NULL,
+                            FOREIGN KEY (TABLEID) REFERENCES TTable(TABLEID))''')
+        current.execute('''INSERT OR IGNORE INTO TableShot (TABLEID, SHOTID)
+                            SELECT TABLEID, SHOTID FROM TableShotOld''')
+        current.execute("DROP TABLE TableShotOld")
 
     def createDB(self):
+        # the schema only needs creating once for each pool
+        if self.pool.schemaReady:
+            return
         current = self.connection.cursor()
         # create Ball table
         current.execute('''CREATE TABLE IF NOT EXISTS Ball (
@@ -380,12 +1134,28 @@ class Database:
                             FOREIGN KEY (BALLID) REFERENCES Ball(BALLID),
                             FOREIGN KEY (TABLEID) REFERENCES TTable(TABLEID))''')
     
-        # create TableShot 
+        # create TableShot, linking every table of a shot to it
+        self.migrateTableShot(current)
         current.execute('''CREATE TABLE IF NOT EXISTS TableShot(
-                            TABLEID INTEGER NOT NULL,
-                            SHOTID INTEGER PRIMARY KEY AUTOINCREMENT,
+                            TABLEID INTEGER PRIMARY KEY,
+                            SHOTID INTEGER NOT NULL,
+                            FOREIGN KEY (TABLEID) REFERENCES TTable(TABLEID))''')
+
+        # create TableBlob, the balls of one frame packed by pack_frame
+        current.execute('''CREATE TABLE IF NOT EXISTS TableBlob (
+                            TABLEID INTEGER PRIMARY KEY,
+                            BALLS BLOB NOT NULL,
                             FOREIGN KEY (TABLEID) REFERENCES TTable(TABLEID))''')
 
+        # create ShotBlob, the frames of one shot packed by pack_shot; frame
+        # i of the shot is the table FIRSTTABLE + i
+        current.execute('''CREATE TABLE IF NOT EXISTS ShotBlob (
+                            SHOTID INTEGER PRIMARY KEY,
+                            FIRSTTABLE INTEGER NOT NULL,
+                            FRAMES INTEGER NOT NULL,
+                            BALLS BLOB NOT NULL,
+                            FOREIGN KEY (SHOTID) REFERENCES Shot(SHOTID))''')
+
         # create Game 
         current.execute('''CREATE TABLE IF NOT EXISTS Game (
                             GAMEID INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -408,66 +1178,203 @@ class Database:
                             FOREIGN KEY (GAMEID) REFERENCES Game(GAMEID)
                             )''')
 
+        # index the columns tables are looked up by, so reads do not scan
+        current.execute('''CREATE INDEX IF NOT EXISTS BallTableByTable
+                            ON BallTable (TABLEID, BALLID)''')
+        current.execute('''CREATE INDEX IF NOT EXISTS TableShotByShot
+                            ON TableShot (SHOTID, TABLEID)''')
+        current.execute('''CREATE INDEX IF NOT EXISTS ShotBlobByTable
+                            ON ShotBlob (FIRSTTABLE)''')
+        current.execute('''CREATE INDEX IF NOT EXISTS PlayerByGame
+                            ON Player (GAMEID)''')
 
         # commit changes and close the connection
         current.close()
         self.connection.commit()
+        self.pool.schemaReady = True
 
     def readTable(self, tableID):
-        adjustedTableID = tableID + 1
-        cursor = self.connection.cursor()
+        # the public table ids start at 0, TABLEID starts at 1
+        return next(self.iterTables("TTable.TABLEID = ?", (tableID + 1,)), None)
 
-        try:
-            # checks to see if the table ID exists in the database
-            cursor.execute("SELECT COUNT(TABLEID) FROM BallTable WHERE TABLEID = ?", (adjustedTableID,))
-            if cursor.fetchone()[0] == 0:
-                return None # table ID does not exist
-            
-            # retrieves the ball information 
-            balls = cursor.execute("""
-                SELECT Ball.BALLID, BALLNO, XPOS, YPOS, XVEL, YVEL
-                FROM BallTable
-                INNER JOIN Ball ON BallTable.BALLID = Ball.BALLID
-                WHERE BallTable.TABLEID = ?
-            """, (adjustedTableID,)).fetchall()
-
-            # retrieves time 
-            cursor.execute("SELECT TIME FROM TTable WHERE TABLEID = ?", (adjustedTableID,))
-            timeResult = cursor.fetchone()
-
-            if not timeResult:
-                return None # time not found 
-            
-            tableTime = timeResult[0]
-            table = Table()
-            table.time = tableTime
-    
-            # iterates through all the balls
-            for ballData in balls:
-                ballID, ballNo, xpos, ypos, xvel, yvel = ballData
+    def readTables(self, start=0, end=None):
+        """
+        Yields the tables with ids start up to (not including) end, or to
+        the last table if end is None, from one ordered query.
+        """
+        if end is None:
+            return self.iterTables("TTable.TABLEID >= ?", (start + 1,))
+        return self.iterTables("TTable.TABLEID >= ? AND TTable.TABLEID < ?", (start + 1, end + 1))
+
+    def readShot(self, shotID):
+        """
+        Yields the tables of a shot in order from one query.
+        """
+        return self.iterTables("TTable.TABLEID IN (SELECT TABLEID FROM TableShot WHERE SHOTID = ?)", (shotID,))
 
-                # if the ball is not moving - it is still
+    def iterTables(self, where, parameters):
+        """
+        Yields a Table for each TTable row matching where, ordered by
+        TABLEID. Balls come from the Ball rows or the TableBlob joined to
+        each table in the same query, or else from the ShotBlob holding it.
+        """
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(f"""
+                SELECT TTable.TABLEID, TTable.TIME, TableBlob.BALLS,
+                       BALLNO, XPOS, YPOS, XVEL, YVEL
+                FROM TTable
+                LEFT JOIN TableBlob ON TableBlob.TABLEID = TTable.TABLEID
+                LEFT JOIN BallTable ON BallTable.TABLEID = TTable.TABLEID
+                LEFT JOIN Ball ON Ball.BALLID = BallTable.BALLID
+                WHERE {where}
+                ORDER BY TTable.TABLEID, Ball.BALLID
+            """, parameters)
+
+            tableID = None
+            for row in cursor:
+                rowTableID, rowTime, blob, ballNo, xpos, ypos, xvel, yvel = row
+
+                # a new TABLEID finishes the table before it
+                if rowTableID != tableID:
+                    if tableID is not None:
+                        yield self.buildTable(tableTime, frame)
+                    tableID, tableTime, frame = rowTableID, rowTime, []
+                    if blob is not None:
+                        frame = unpack_frame(blob)
+                    elif ballNo is None:
+                        frame = self.readShotBlob(tableID) or []
+
+                # the rows become frame rows, with still balls not moving
+                if ballNo is None:
+                    continue
                 if xvel is None and yvel is None:
-                    ballObject = StillBall(ballNo, Coordinate(xpos, ypos))
+                    frame.append((ballNo, xpos, ypos, phylib.PHYLIB_STILL_BALL, 0.0, 0.0))
                 else:
-                    # the ball is moving (rolling)
-                    xvel = xvel or 0
-                    yvel = yvel or 0
-                    velocity = Coordinate(xvel, yvel)
-                    velvelspeed = phylib.phylib_length(velocity)
-                    drag_x, drag_y = (-xvel / velvelspeed * DRAG, -yvel / velvelspeed * DRAG) if velvelspeed != 0 else (0, 0)
-                    ballObject = RollingBall(ballNo, Coordinate(xpos, ypos), velocity, Coordinate(drag_x, drag_y))
+                    frame.append((ballNo, xpos, ypos, phylib.PHYLIB_ROLLING_BALL, xvel or 0, yvel or 0))
 
-                table += ballObject # adds ball object to table
+            if tableID is not None:
+                yield self.buildTable(tableTime, frame)
+        finally:
+            cursor.close()
+
+    def readShotBlob(self, tableID):
+        """
+        Returns the frame rows of a TABLEID from the ShotBlob that holds
+        it, or None if no shot blob does.
+        """
+        firstTable, frames = self.shotCache
+        if firstTable is not None and firstTable <= tableID < firstTable + len(frames):
+            return frames[tableID - firstTable][1]
+
+        row = self.connection.execute("""
+            SELECT FIRSTTABLE, BALLS FROM ShotBlob
+            WHERE FIRSTTABLE <= ? AND ? < FIRSTTABLE + FRAMES
+        """, (tableID, tableID)).fetchone()
+        if not row:
+            return None
+        firstTable, data = row
+        frames = unpack_shot(data)
+        self.shotCache = (firstTable, frames)
+        return frames[tableID - firstTable][1]
+
+    def buildTable(self, tableTime, frame):
+        """
+        Returns a Table at tableTime holding the balls of the frame rows
+        (number, x, y, type, xvel, yvel).
+        """
+        return Table.from_frame(frame, tableTime)
+
+    def writeFrame(self, time, frame):
+        """
+        Writes one frame from Table.roll_frames (rows of number, x, y, type,
+        xvel, yvel) as a table at the given time, like writeTable does.
+        """
+        return self.writeFrames([(time, frame)])[0]
+
+    def lastID(self, cursor, table):
+        """
+        Returns the last AUTOINCREMENT id handed out for a table (0 if none).
+        """
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?;", (table,))
+        row = cursor.fetchone()
+        return row[0] if row else 0
 
+    def writeFrames(self, frames, shotID=None):
+        """
+        Writes many frames, given as (time, rows from Table.roll_frames)
+        pairs, in one transaction with executemany and links them to shotID
+        if one is given. The balls go in as Ball rows, one blob per frame or
+        one blob for the shot, depending on the storage mode (without a
+        shotID the "shot" mode writes a blob per frame). Returns the TABLEIDs
+        in the order of the frames and keeps the row count and rows/sec in
+        writeStats.
+        """
+        started = time.perf_counter()
+        frames = list(frames)
+        if self.connection.in_transaction:
+            self.connection.commit()
+
+        current = self.connection.cursor()
+        try:
+            # the write lock is taken up front so the ids below stay ours
+            current.execute("BEGIN IMMEDIATE;")
+            tableID = self.lastID(current, "TTable")
+            ballID = self.lastID(current, "Ball")
+
+            tables = []
+            balls = []
+            links = []
+            for frameTime, frame in frames:
+                tableID += 1
+                tables.append((tableID, frameTime))
+                if self.storage != "rows":
+                    continue
+
+                for number, xpos, ypos, balltype, xvel, yvel in frame:
+                    # still balls are stored without a velocity
+                    if balltype != phylib.PHYLIB_ROLLING_BALL:
+                        xvel = yvel = None
+                    ballID += 1
+                    balls.append((ballID, int(number), xpos, ypos, xvel, yvel))
+                    links.append((ballID, tableID))
+
+            current.executemany("INSERT INTO TTable VALUES(?, ?);", tables)
+            if self.storage == "rows":
+                current.executemany("INSERT INTO Ball VALUES(?, ?, ?, ?, ?, ?);", balls)
+                current.executemany("INSERT INTO BallTable VALUES(?, ?);", links)
+            elif self.storage == "shot" and shotID is not None and tables:
+                balls = [(shotID, tables[0][0], len(tables), pack_shot(frames, self.precision, self.delta))]
+                current.executemany("INSERT OR REPLACE INTO ShotBlob VALUES(?, ?, ?, ?);", balls)
+            else:
+                balls = [(frameTableID, pack_frame(frame, self.precision))
+                         for (frameTableID, _), (_, frame) in zip(tables, frames)]
+                current.executemany("INSERT INTO TableBlob VALUES(?, ?);", balls)
+            shots = []
+            if shotID is not None:
+                shots = [(frameTableID, shotID) for frameTableID, _ in tables]
+                current.executemany("INSERT OR IGNORE INTO TableShot VALUES(?, ?);", shots)
+
+            self.connection.commit()
+        except:
+            self.connection.rollback()
+            raise
         finally:
-            cursor.close() # closes connection
+            current.close()
 
-        # commits any changes made and returns table
-        self.connection.commit()
-        return table
+        seconds = time.perf_counter() - started
+        rows = len(tables) + len(balls) + len(links) + len(shots)
+        self.writeStats = {"frames": len(tables), "rows": rows, "seconds": seconds,
+                           "rows_per_sec": rows / seconds if seconds > 0 else 0.0}
+
+        return [frameTableID for frameTableID, _ in tables]
 
     def writeTable(self, table):
+        # packed storage writes the table as a frame of its balls
+        if self.storage != "rows":
+            rolled = table.roll_frames([0.0]).tolist()
+            return self.writeFrames([(table.time, rolled[0] if rolled else [])])[0]
+
         # starts a new connection
         current = self.connection.cursor()
         
@@ -477,38 +1384,26 @@ class Database:
         # retrieves the ID of the new ball that was inserted
         tableID = current.lastrowid
 
-        # iterate through each ball in table
-        for object in table:
-
-            # if the ball is a rolling ball 
-            if isinstance(object, RollingBall):
-                current.execute("""
-                    INSERT INTO Ball
-                    VALUES(NULL, ?, ?, ?, ?, ?);
-                    """, (object.obj.rolling_ball.number, object.obj.rolling_ball.pos.x, object.obj.rolling_ball.pos.y, object.obj.rolling_ball.vel.x, object.obj.rolling_ball.vel.y))
-                # retrieve the ID of the newly inserted ball
-                ballID = current.lastrowid
-
-                # links the newly inserted ball to BallTable
-                current.execute("""
-                    INSERT INTO BallTable
-                    VALUES(?, ?);
-                    """, (ballID, tableID))
-
-            # if it is a still ball
-            elif isinstance(object, StillBall):
-                current.execute("""
-                    INSERT INTO Ball
-                    VALUES(NULL, ?, ?, ?, NULL, NULL);
-                    """, (object.obj.still_ball.number, object.obj.still_ball.pos.x, object.obj.still_ball.pos.y))
-                # retrieves the ID of the newly inserted ball
-                ballID = current.lastrowid
-
-                # links the newly inserted ball to BallTable
-                current.execute("""
-                    INSERT INTO BallTable
-                    VALUES(?, ?);
-                    """, (ballID, tableID))
+        # iterate through each ball in one snapshot of the table
+        for balltype, number, xpos, ypos, xvel, yvel, _, _, _ in table.snapshot().tolist():
+
+            # a rolling ball keeps its velocity, a still ball has none
+            if balltype == phylib.PHYLIB_ROLLING_BALL:
+                values = (int(number), xpos, ypos, xvel, yvel)
+            else:
+                values = (int(number), xpos, ypos, None, None)
+            current.execute("""
+                INSERT INTO Ball
+                VALUES(NULL, ?, ?, ?, ?, ?);
+                """, values)
+            # retrieve the ID of the newly inserted ball
+            ballID = current.lastrowid
+
+            # links the newly inserted ball to BallTable
+            current.execute("""
+                INSERT INTO BallTable
+                VALUES(?, ?);
+                """, (ballID, tableID))
 
         # closes and commits any changes
         current.close()
@@ -517,8 +1412,12 @@ class Database:
         return tableID
 
     def close (self):
+        # the connection goes back to the pool instead of being closed
+        if self.connection is None:
+            return
         self.connection.commit()
-        self.connection.close()
+        self.pool.release(self.connection)
+        self.connection = None
 
     def getGame(self, gameID):
 
@@ -610,8 +1509,56 @@ class Database:
         self.connection.commit()
         current.close()
 
+
+################################################################################
+class ShotMetrics:
+    """
+    Totals of the reports Game makes of each shot when SHOT_METRICS is on:
+    shots played and served from the cache, segments, frames and database
+    rows, and the seconds spent in each of SHOT_STAGES. It may be shared
+    between threads.
+    """
+
+    def __init__( self ):
+        self.lock = threading.Lock();
+        self.reset();
+
+    def reset( self ):
+        # starts the totals again from nothing
+        with self.lock:
+            self.totals = { "shots": 0, "cached": 0, "segments": 0, "frames": 0, "rows": 0 };
+            self.seconds = dict.fromkeys( SHOT_STAGES, 0.0 );
+            self.last = None;
+
+    def add( self, report ):
+        """
+        Adds one shot's report to the totals.
+        """
+        with self.lock:
+            self.totals["shots"] += 1;
+            self.totals["cached"] += report["cached"];
+            for name in ( "segments", "frames", "rows" ):
+                self.totals[name] += report[name];
+            for stage, seconds in report["seconds"].items():
+                self.seconds[stage] += seconds;
+            self.last = report;
+
+    def info( self ):
+        """
+        Returns the totals, the seconds of each stage and the last shot's
+        report.
+        """
+        with self.lock:
+            return dict( self.totals, seconds=dict( self.seconds ), last=self.last );
+
+# the totals of every Game that is not given its own
+SHOT_TOTALS = ShotMetrics();
+
+
+################################################################################
 class Game:
-    def __init__(self, gameID=None, gameName=None, player1Name=None, player2Name=None):
+    def __init__(self, gameID=None, gameName=None, player1Name=None, player2Name=None, cache=None, metrics=None,
+                 sampling=None):
         # validates input types 
         if not isinstance(gameID, (int, type(None))):
             raise TypeError("Game ID must either be an integer or None.")
@@ -626,6 +1573,10 @@ class Game:
 
         self.db = Database()
         self.db.createDB()
+        self.cache = cache  # a ShotCache to serve repeated shots from, or None
+        self.metrics = metrics if metrics is not None else SHOT_TOTALS  # totals the shots are added to
+        self.shotStats = None  # the report of the last shot, when SHOT_METRICS is on
+        self.sampling = sampling if sampling is not None else FRAME_SAMPLING  # which frames of a shot are made
 
         if gameID is not None:
             gameData = self.db.getGame(gameID)
@@ -642,76 +1593,163 @@ class Game:
                 self.player2Name = player2Name
             else:
                 raise ValueError("New game requires game name and player names")
-    
-    def shoot(self, gameName, playerName, table, xvel, yvel):
 
-        db = Database() # initalizes an instance of database
-        shotID = self.db.newShot(playerName, table, xvel, yvel, self.gameID)  # Log the shot in the database
+    def close(self):
+        # gives the game's database connection back to the pool
+        self.db.close()
+    
+    def write_shot_frames(self, frames, shotID, report):
+        # writes frames of a shot, adding the time and rows to its report if there is one
+        self.db.writeFrames(frames, shotID)
+        if report is not None:
+            report["seconds"]["write"] += self.db.writeStats["seconds"]
+            report["rows"] += self.db.writeStats["rows"]
+
+    def report_shot(self, report):
+        """
+        Keeps the report of a shot as shotStats and adds it to the game's
+        metrics. The report has the shot's id (None when it came from the
+        cache), if it came from the cache, its segments, frames and database
+        rows, the seconds of each of SHOT_STAGES, and elapsed: the seconds
+        from start to end, which also has the time taken by whatever reads
+        the frames.
+        """
+        self.shotStats = report
+        self.metrics.add(report)
 
-        cue_ball = table.cueBall()  # find the cue ball object on the table
+    def shoot(self, gameName, playerName, table, xvel, yvel, output="svg"):
+        # collects the frames of shoot_frames and the table it ends with
+        list_svg = []  # list to store SVG representations of the table states
+        frames = self.shoot_frames(gameName, playerName, table, xvel, yvel, output)
+        while True:
+            try:
+                list_svg.append(next(frames))
+            except StopIteration as done:
+                return list_svg, done.value
 
-        if cue_ball is None:
-            print("Making cue ball again.")
-            # If the cue ball does not exist, recreate it at the center
-            xpos = TABLE_WIDTH / 2.0 + random.uniform(-3.0, 3.0)
-            ypos = TABLE_LENGTH - TABLE_WIDTH / 2.0
-            pos = Coordinate(xpos, ypos)
-            rb = RollingBall(0, pos, Coordinate(0.0, 0.0), Coordinate(0.0, 0.0))  # Use RollingBall or StillBall depending on your game's logic
-            table += rb
-            print("Cue ball returned to center.")
-        else:
-            # If the cue ball exists, retrieve its position
-            xpos = cue_ball.obj.still_ball.pos.x
-            ypos = cue_ball.obj.still_ball.pos.y
+    def shoot_frames(self, gameName, playerName, table, xvel, yvel, output="svg"):
+        """
+        Generator that plays a shot and yields each frame as soon as it is
+        rolled, as an SVG document or, with output "data", as the list from
+        Table.frame_data to draw over Table.static_svg. Frames are written
+        to the database every SHOT_WRITE_BATCH frames, or all at the end
+        with "shot" storage (which holds every frame's balls until then), and
+        the table the shot ends with is the generator's return value. The
+        frames are kept for the cache only up to its shot_budget, so the
+        memory a shot takes stays bounded however long it runs.
+        """
+        if output not in SHOT_OUTPUTS:
+            raise ValueError(f"Unknown shot output {output}")
+        render = table.frame_data if output == "data" else table.frame_svg
+
+        # with SHOT_METRICS each stage is timed into a report of the shot
+        timed = SHOT_METRICS
+        if timed:
+            clock = time.perf_counter
+            seconds = dict.fromkeys(SHOT_STAGES, 0.0)
+            report = {"shot": None, "cached": False, "segments": 0, "frames": 0, "rows": 0, "seconds": seconds}
+            began = clock()
+
+        # a shot the cache knows is played back without phylib or the
+        # database; shots that place a new cue ball at random are not kept
+        key = None
+        if self.cache is not None and table.cueBall() is not None:
+            key = self.cache.key(table, xvel, yvel, f"{output} {self.sampling!r}")
+            cached = self.cache.get(key)
+            if timed:
+                seconds["cache"] += clock() - began
+            if cached is not None:
+                frames, final, duration = cached
+                yield from frames
+                result = final.copy()
+                result.time = table.time + duration
+                if timed:
+                    report.update(cached=True, frames=len(frames), elapsed=clock() - began)
+                    self.report_shot(report)
+                return result
+        start_time = table.time
+        kept_frames = []  # frames to give the cache, until they outgrow its shot_budget
+        kept_size = 0
 
-        # update the cue ball's state to a rolling ball with the given velocity
-        cue_ball.type = phylib.PHYLIB_ROLLING_BALL
-        
-        cue_ball.obj.rolling_ball.number = 0
-        
-        cue_ball.obj.rolling_ball.pos.x = xpos
-        cue_ball.obj.rolling_ball.pos.y = ypos
-        
-        cue_ball.obj.rolling_ball.vel.x = xvel
-        cue_ball.obj.rolling_ball.vel.y = yvel
+        shotID = self.db.newShot(playerName, table, xvel, yvel, self.gameID)  # Log the shot in the database
 
-        # initial acceleration is zero
-        xacc = 0
-        yacc = 0
-        
-        cue_ball.obj.rolling_ball.acc.x = xacc
-        cue_ball.obj.rolling_ball.acc.y = yacc
+        table.strike(xvel, yvel)  # set the cue ball rolling
+
+        shot_frames = []  # frames of the shot not yet written to the database
+        batch = None if self.db.storage == "shot" else SHOT_WRITE_BATCH
+
+        # simulate every segment of the shot in a single call into phylib
+        if timed:
+            report["shot"] = shotID
+            mark = clock()
+        segments = table.simulate()
+        if timed:
+            seconds["simulate"] += clock() - mark
+            report["segments"] = len(segments)
+
+        # the sampling picks the frames of each segment
+        sampling = self.sampling
+        interval = sampling.interval(segments, table.time)
+        budget = sampling.max_frames or math.inf
+        made = 0  # frames made so far
+        last = None  # the rows of the last frame made
+
+        for segment in segments:
+            segment_start = table.time  # initialize time for the current segment
+            segment_duration = segment.time - segment_start
+
+            # roll the table to every frame of the segment in one call
+            if timed:
+                mark = clock()
+            elapsed = sampling.times(segment_duration, interval)
+            rolled = (table.roll_array if ROLL_NUMPY else table.roll_frames)(elapsed).tolist()
+            if timed:
+                seconds["roll"] += clock() - mark
+
+            for frame_index, frame in enumerate(rolled):
+                # the first frame of a segment is the table at its event
+                if made >= budget:
+                    break
+                if frame_index > 0 and not sampling.moved(last, frame):
+                    continue
+                made += 1
+                last = frame
+                shot_frames.append((table.time + elapsed[frame_index], frame))
+                if timed:
+                    mark = clock()
+                rendered = render(frame)
+                if timed:
+                    seconds["render"] += clock() - mark
+                if key is not None:
+                    kept_frames.append(rendered)
+                    kept_size += ShotCache.frame_size(rendered)
+                    if kept_size > self.cache.shot_budget:
+                        key, kept_frames = None, []
+                yield rendered
+
+            # write what has built up in one transaction
+            if batch is not None and len(shot_frames) >= batch:
+                self.write_shot_frames(shot_frames, shotID, report if timed else None)
+                shot_frames = []
 
-        # calculate the acceleration based on velocity and drag
-        velspeed = phylib.phylib_length(Coordinate(xvel, yvel))
-        if velspeed > VEL_EPSILON:
-            xacc = (-(xvel) / velspeed) * DRAG
-            yacc = (-(yvel) / velspeed) * DRAG
+            table = segment  # move to the next segment
 
-        list_svg = []  # list to store SVG representations of the table states
-        segment = table  # start with the current table as the first segment
+        # save the rest of the shot to the database in one transaction
+        if shot_frames:
+            self.write_shot_frames(shot_frames, shotID, report if timed else None)
 
-        while True:
-            time = table.time  # initialize time for the current segment
-            segment = table.segment()  # get the next segment from the table
-
-            if segment:
-                segment_duration = segment.time - time
-                frames = int(segment_duration / FRAME_INTERVAL)  # Calculate the number of frames for this segment
-
-                for frame_index in range(frames):
-                    elapsed_time = frame_index * FRAME_INTERVAL
-                    newTable = table.roll(elapsed_time)  # Calculate new table state
-                    newTable.time = table.time + elapsed_time
-
-                    # save the state of the table at this frame to the database
-                    tableID = db.writeTable(newTable) + 1
-                    db.TShot(tableID, shotID)
-                    list_svg.append(newTable.svg())
-            else:
-                break  # exit the loop if no more segments are found
+        # the final table is counted as a few kilobytes
+        if key is not None:
+            if timed:
+                mark = clock()
+            self.cache.put(key, kept_frames, table, table.time - start_time, kept_size + 4096)
+            if timed:
+                seconds["cache"] += clock() - mark
 
-            table = segment  # move to the next segment
+        if timed:
+            report["frames"] = made
+            report["elapsed"] = clock() - began
+            self.report_shot(report)
 
         # cue_ball_updated = table.cueBall()  # Retrieve the cue ball object from the table again
         # if cue_ball_updated:
@@ -721,4 +1759,271 @@ class Game:
         # else:
         #     print("Cue ball not found on the table after the shot.")
 
-        return list_svg, table
+        return table
+
+
+################################################################################
+# what-if shots
+#
+# Shots played only to see how they turn out: nothing is rendered or written
+# to the database. The table goes to the workers as one packed frame blob
+# with 8 bytes per float, so every worker starts from exactly the same balls.
+
+SHOT_WORKERS = os.cpu_count() or 1;
+SHOT_CHUNK = 8;        # shots sent to a worker process at a time
+
+def evaluate_shot( packed, xvel, yvel, keep_table=False ):
+    """
+    Plays one shot from the table in a packed frame blob and returns a dict
+    of its outcome: the cue velocity, the numbers of the balls potted, if
+    the cue ball was potted (scratch), where the cue ball stopped (or None),
+    how long the shot took and how many events it had. With keep_table the
+    final table is included as a packed frame blob too.
+    """
+    table = Table.from_frame( unpack_frame( packed ) );
+    before = { int( row[0] ) for row in unpack_frame( packed ) };
+    table.strike( xvel, yvel );
+
+    events = table.simulate();
+    final = events[-1] if events else table;
+    rolled = final.roll_frames( [ 0.0 ] ).tolist();
+    rows = rolled[0] if rolled else [];
+    after = { int( row[0] ): row for row in rows };
+
+    outcome = {
+        "xvel": xvel,
+        "yvel": yvel,
+        "potted": sorted( number for number in before - set( after ) if number != 0 ),
+        "scratch": 0 not in after,
+        "cue": ( after[0][1], after[0][2] ) if 0 in after else None,
+        "time": final.time - table.time,
+        "events": len( events ),
+    };
+    if keep_table:
+        outcome["table"] = pack_frame( rows, 8 );
+    return outcome;
+
+def _evaluate_chunk( packed, shots, keep_table ):
+    # one worker's share of the shots
+    return [ evaluate_shot( packed, xvel, yvel, keep_table ) for xvel, yvel in shots ];
+
+def evaluate_shots( table, shots, workers=None, tables=False, executor=None ):
+    """
+    Plays every (xvel, yvel) shot from the table without rendering or
+    saving any of it, and returns their outcomes from evaluate_shot in
+    the same order. The shots are shared out over a process pool of
+    workers processes (SHOT_WORKERS by default), or over executor if one
+    is given; with workers 0 or 1 they are played here one after another.
+    With tables each outcome also has its final table, which
+    Table.from_frame( unpack_frame( outcome["table"] ) ) gives back.
+    """
+    shots = [ ( float( xvel ), float( yvel ) ) for xvel, yvel in shots ];
+    rolled = table.roll_frames( [ 0.0 ] ).tolist();
+    packed = pack_frame( rolled[0] if rolled else [], 8 );
+
+    if workers is None:
+        workers = SHOT_WORKERS;
+    if executor is None and ( workers <= 1 or len( shots ) <= 1 ):
+        return _evaluate_chunk( packed, shots, tables );
+
+    chunks = [ shots[i:i + SHOT_CHUNK] for i in range( 0, len( shots ), SHOT_CHUNK ) ];
+    if executor is not None:
+        results = executor.map( _evaluate_chunk, [ packed ] * len( chunks ), chunks, [ tables ] * len( chunks ) );
+        return [ outcome for chunk in results for outcome in chunk ];
+
+    with concurrent.futures.ProcessPoolExecutor( max_workers=workers ) as pool:
+        results = pool.map( _evaluate_chunk, [ packed ] * len( chunks ), chunks, [ tables ] * len( chunks ) );
+        return [ outcome for chunk in results for outcome in chunk ];
+
+
+################################################################################
+# shot planning
+#
+# plan_shot looks for cue velocities that pot a target ball. It plays a coarse
+# grid of aim angles and speeds, the angles nearest the target first, then
+# rounds of smaller steps around the best shots so far until the time budget
+# runs out. Each shot is played an event at a time with Table.segment and is
+# stopped once it is decided: the target drops, the cue ball drops, or (with
+# first_contact) the cue ball hits another ball first. Outcomes are kept per
+# process for each table and velocity, rounded to PLAN_QUANTUM, so a shot
+# tried again, in this search or a later one, is not played again.
+
+PLAN_BUDGET = 1.0;          # seconds plan_shot searches for
+PLAN_ANGLES = 72;           # aim angles of the coarse grid
+PLAN_SPEEDS = ( 500.0, 1000.0, 1750.0, 2500.0, 3500.0, 5000.0 );
+PLAN_BEAM = 6;              # best shots refined in each round
+PLAN_ROUNDS = 8;            # most rounds of refinement
+PLAN_MAX_EVENTS = 200;      # events a planned shot runs before it is given up on
+PLAN_QUANTUM = 0.5;         # velocities are rounded to this before playing
+PLAN_CACHE_SIZE = 65536;    # outcomes kept in each process
+SCRATCH_PENALTY = TABLE_LENGTH;
+FOUL_PENALTY = TABLE_LENGTH / 2.0;
+
+def plan_outcome( packed, target, pocket, first_contact, xvel, yvel ):
+    """
+    Plays one shot for plan_shot from the table in a packed frame blob and
+    returns a dict of its outcome: the cue velocity, potted (the target
+    dropped in pocket, an index into Table.pockets, or in any pocket when
+    pocket is None), scratch, contact (the first ball the cue ball hit, or
+    None), events and score. The score is 0 for a pot without a scratch,
+    and otherwise how near in mm the target came to the pocket, plus
+    SCRATCH_PENALTY for a scratch and, with first_contact, FOUL_PENALTY if
+    the cue ball did not hit the target first. Outcomes are kept, so the
+    same shot is only played once in each process; every call gets a dict
+    of its own.
+    """
+    return dict( zip( PLAN_FIELDS, _played_outcome( packed, target, pocket, first_contact, xvel, yvel ) ) );
+
+# the keys of a plan_outcome dict, in the order _played_outcome gives them
+PLAN_FIELDS = ( "xvel", "yvel", "potted", "scratch", "contact", "events", "score" );
+
+@functools.lru_cache( maxsize=PLAN_CACHE_SIZE )
+def _played_outcome( packed, target, pocket, first_contact, xvel, yvel ):
+    # plays the shot for plan_outcome; the outcome is a tuple, as every
+    # caller shares what the cache keeps
+    table = Table.from_frame( unpack_frame( packed ) );
+    table.strike( xvel, yvel );
+    holes = table.pockets();
+    aims = holes if pocket is None else [ holes[pocket] ];
+
+    def distance( row, places ):
+        return min( math.hypot( row[1] - x, row[2] - y ) for x, y in places );
+
+    balls = { int( row[0] ): row for row in table.roll_frames( [ 0.0 ] ).tolist()[0] };
+    closest = distance( balls[target], aims ) - HOLE_RADIUS;
+    potted = scratch = False;
+    contact = None;
+    events = 0;
+
+    while events < PLAN_MAX_EVENTS and table.time < MAX_TIME:
+        following = table.segment();
+        if following is None:
+            break;
+        events += 1;
+        rolled = following.roll_frames( [ 0.0 ] ).tolist();
+        after = { int( row[0] ): row for row in ( rolled[0] if rolled else [] ) };
+
+        # the first still ball set rolling was hit by the cue ball
+        if contact is None:
+            hit = [ number for number, row in after.items() if number != 0
+                    and row[3] == phylib.PHYLIB_ROLLING_BALL
+                    and balls[number][3] != phylib.PHYLIB_ROLLING_BALL ];
+            if hit:
+                contact = target if target in hit else hit[0];
+
+        if target in after:
+            closest = min( closest, distance( after[target], aims ) - HOLE_RADIUS );
+        else:
+            # the target dropped in the hole nearest where it was at the event
+            dropped = table.roll_frames( [ following.time - table.time ] ).tolist()[0];
+            row = next( row for row in dropped if int( row[0] ) == target );
+            hole = min( holes, key=lambda place: distance( row, [ place ] ) );
+            potted = pocket is None or hole == holes[pocket];
+            closest = 0.0 if potted else distance( row, aims ) - HOLE_RADIUS;
+        scratch = 0 not in after;
+
+        if target not in after or scratch or ( first_contact and contact not in ( None, target ) ):
+            break;
+        balls = after;
+        table = following;
+
+    score = 0.0 if potted else max( closest, 0.0 );
+    if scratch:
+        score += SCRATCH_PENALTY;
+    if first_contact and contact != target:
+        score += FOUL_PENALTY;
+
+    return ( xvel, yvel, potted, scratch, contact, events, score );
+
+def _plan_chunk( packed, target, pocket, first_contact, shots ):
+    # one worker's share of the shots
+    return [ plan_outcome( packed, target, pocket, first_contact, xvel, yvel ) for xvel, yvel in shots ];
+
+def plan_shot( table, target, pocket=None, budget=PLAN_BUDGET, first_contact=True,
+               best=5, workers=None, executor=None ):
+    """
+    Searches for cue velocities that pot ball number target, in pocket (an
+    index into table.pockets()) or in any pocket when pocket is None, for
+    about budget seconds. Returns the best outcomes of plan_outcome found,
+    at most best of them, pots first and softer shots before harder ones.
+    Shots are played in a process pool of workers processes (SHOT_WORKERS
+    by default) or on executor if one is given, which keeps its outcomes
+    between searches; with workers 0 or 1 they are played here.
+    """
+    deadline = time.monotonic() + budget;
+    rolled = table.roll_frames( [ 0.0 ] ).tolist();
+    frame = rolled[0] if rolled else [];
+    balls = { int( row[0] ): row for row in frame };
+    if 0 not in balls:
+        raise ValueError( "There is no cue ball to plan a shot for" );
+    if target == 0 or target not in balls:
+        raise ValueError( f"Ball {target} is not on the table" );
+    if pocket is not None and not 0 <= pocket < len( table.pockets() ):
+        raise ValueError( f"There is no pocket {pocket}" );
+    packed = pack_frame( frame, 8 );
+
+    if workers is None:
+        workers = SHOT_WORKERS;
+    pool = None;
+    if executor is None and workers > 1:
+        pool = executor = concurrent.futures.ProcessPoolExecutor( max_workers=workers );
+
+    tried = {};     # outcome of every rounded velocity played
+
+    def play( shots ):
+        # plays the shots not played yet, until the deadline
+        fresh = {};
+        for xvel, yvel in shots:
+            key = ( round( xvel / PLAN_QUANTUM ) * PLAN_QUANTUM, round( yvel / PLAN_QUANTUM ) * PLAN_QUANTUM );
+            if key not in tried:
+                fresh[key] = True;
+        fresh = list( fresh );
+
+        if executor is None:
+            for key in fresh:
+                if time.monotonic() >= deadline:
+                    return;
+                tried[key] = plan_outcome( packed, target, pocket, first_contact, *key );
+            return;
+
+        chunks = [ fresh[i:i + SHOT_CHUNK] for i in range( 0, len( fresh ), SHOT_CHUNK ) ];
+        futures = [ executor.submit( _plan_chunk, packed, target, pocket, first_contact, chunk ) for chunk in chunks ];
+        done, waiting = concurrent.futures.wait( futures, timeout=max( deadline - time.monotonic(), 0.0 ) );
+        for future in waiting:
+            future.cancel();
+        for future in done:
+            for outcome in future.result():
+                tried[( outcome["xvel"], outcome["yvel"] )] = outcome;
+
+    def ranked():
+        return sorted( tried.values(), key=lambda outcome: ( outcome["score"], math.hypot( outcome["xvel"], outcome["yvel"] ) ) );
+
+    try:
+        # the coarse grid, nearest the line from the cue ball to the target first
+        cue, aim = balls[0], balls[target];
+        direct = math.atan2( aim[2] - cue[2], aim[1] - cue[1] );
+        step = 2.0 * math.pi / PLAN_ANGLES;
+        angles = sorted( ( direct + i * step for i in range( PLAN_ANGLES ) ),
+                         key=lambda angle: abs( math.remainder( angle - direct, 2.0 * math.pi ) ) );
+        play( [ ( speed * math.cos( angle ), speed * math.sin( angle ) ) for angle in angles for speed in PLAN_SPEEDS ] );
+
+        # then smaller steps of angle and speed around the best shots
+        spread = 0.25;
+        for i in range( PLAN_ROUNDS ):
+            if time.monotonic() >= deadline:
+                break;
+            step /= 3.0;
+            spread /= 2.0;
+            shots = [];
+            for outcome in ranked()[:PLAN_BEAM]:
+                angle = math.atan2( outcome["yvel"], outcome["xvel"] );
+                speed = math.hypot( outcome["xvel"], outcome["yvel"] );
+                for turn in ( -step, 0.0, step ):
+                    for scale in ( 1.0 - spread, 1.0, 1.0 + spread ):
+                        shots.append( ( speed * scale * math.cos( angle + turn ), speed * scale * math.sin( angle + turn ) ) );
+            play( shots );
+    finally:
+        if pool is not None:
+            pool.shutdown( wait=False, cancel_futures=True );
+
+    return ranked()[:best];
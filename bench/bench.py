@@ -0,0 +1,317 @@
+"""
+Benchmarks the physics, database and rendering paths without the web server.
+
+    python bench/bench.py [--repeat N] [--seed S] [--out FILE]
+                          [--baseline FILE] [--save-baseline] [--tolerance T]
+
+Each benchmark plays the same seeded break from Table.setup_pool_table and
+reports its rate (events or frames per second), its time, the bytes it wrote
+and its peak Python memory (from tracemalloc, measured in a separate run so
+tracing does not slow the timed ones). The results are printed as JSON, and
+written to --out if given. With --baseline the rates are compared against an
+earlier --out file, and the exit status is 1 if any fell by more than the
+tolerance; without that file nothing is compared. --save-baseline writes the
+results to the baseline file instead. segment_events and segment_stepped time
+phylib_segment and phylib_segment_stepped from the same tables, and
+segment_speedup is how many times faster the first is; the exit status is
+also 1 if the two give different tables. The database is made in a temporary directory, which is removed afterwards.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Physics and phylib are built in the directory above this one
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+import Physics
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+BREAK_VELOCITY = (0.0, -4000.0)  # straight up the table into the rack
+MAX_EVENTS = 20000  # a break that never settles still ends
+TOLERANCE = 0.25  # how far a rate may fall below the baseline before it counts
+ROUNDS = 20  # times the quick benchmarks go over the break, to time more than noise
+SAME_TABLE = 1e-6  # how far apart segment and segment_stepped may put a ball or an event time
+
+
+# the racked table, the same for the same seed
+def break_table(seed):
+    random.seed(seed)
+    return Physics.Table().setup_pool_table()
+
+
+# the table at every event of the seeded break, starting with the struck table
+def break_events(seed):
+    table = break_table(seed)
+    table.strike(*BREAK_VELOCITY)
+    return [table] + table.simulate(MAX_EVENTS)
+
+
+# the times from a segment's start of its frames, as Game.shoot_frames rolls them
+def frame_times(table, following):
+    count = int((following.time - table.time) / Physics.FRAME_INTERVAL)
+    return [i * Physics.FRAME_INTERVAL for i in range(count)]
+
+
+# bytes the database and its journal files take up
+def database_bytes():
+    path = Physics.DB_PATH
+    return sum(os.path.getsize(name) for name in (path, path + "-wal", path + "-shm")
+               if os.path.exists(name))
+
+
+def fresh_database():
+    database = Physics.Database(True)
+    database.createDB()
+    return database
+
+
+def bench_segment(seed):
+    # phylib_segment called once per event, as the simulation steps through the break
+    struck = break_table(seed)
+    struck.strike(*BREAK_VELOCITY)
+    events = 0
+    for i in range(ROUNDS):
+        table, count = struck, 0
+        while count < MAX_EVENTS:
+            table = table.segment()
+            if table is None:
+                break
+            count += 1
+        events += count
+    return {"events": events}
+
+
+# whether two tables segment made are the same, to within SAME_TABLE
+def same_table(table, other):
+    if table is None or other is None:
+        return table is None and other is None
+    rows, others = table.snapshot().tolist(), other.snapshot().tolist()
+    return (abs(table.time - other.time) <= SAME_TABLE and len(rows) == len(others)
+            and all(abs(a - b) <= SAME_TABLE for row, o in zip(rows, others) for a, b in zip(row, o)))
+
+
+def bench_segment_events(seed):
+    # phylib_segment once from the table at every event of the break
+    events = break_events(seed)
+    for i in range(ROUNDS):
+        for table in events:
+            table.segment()
+    return {"events": ROUNDS * len(events)}
+
+
+def bench_segment_stepped(seed):
+    # phylib_segment_stepped, the fixed-step solver, from the same tables as
+    # segment_events, checked against phylib_segment before it is timed
+    events = break_events(seed)
+    mismatched = sum(not same_table(table.segment(), table.segment(stepped=True)) for table in events)
+    start = time.perf_counter()
+    for table in events:
+        table.segment(stepped=True)
+    return {"events": len(events), "mismatched": mismatched, "seconds": time.perf_counter() - start}
+
+
+def bench_roll(seed):
+    # Table.roll for every frame of the break
+    events = break_events(seed)
+    frames = 0
+    for table, following in zip(events, events[1:]):
+        for t in frame_times(table, following):
+            table.roll(t)
+            frames += 1
+    return {"frames": frames}
+
+
+def bench_roll_frames(seed):
+    # Table.roll_frames, one call for each segment's frames
+    events = break_events(seed)
+    frames = 0
+    for i in range(ROUNDS):
+        for table, following in zip(events, events[1:]):
+            frames += len(table.roll_frames(frame_times(table, following)))
+    return {"frames": frames}
+
+
+def bench_svg(seed):
+    # Table.svg of the table at every event of the break
+    events = break_events(seed)
+    written = sum(len(table.svg()) for i in range(ROUNDS) for table in events)
+    return {"frames": ROUNDS * len(events), "bytes": written}
+
+
+def bench_write_table(seed):
+    # Database.writeTable for the table at every event, one call each
+    events = break_events(seed)
+    database = fresh_database()
+    try:
+        before = database_bytes()
+        for table in events:
+            database.writeTable(table)
+        return {"frames": len(events), "bytes": database_bytes() - before}
+    finally:
+        database.close()
+
+
+def bench_read_table(seed):
+    # Database.readTable of every table bench_write_table wrote
+    events = break_events(seed)
+    database = fresh_database()
+    try:
+        ids = [database.writeTable(table) for table in events]
+        start = time.perf_counter()
+        for tableID in ids:
+            database.readTable(tableID - 1)  # readTable counts from 0, writeTable from 1
+        return {"frames": len(ids), "seconds": time.perf_counter() - start}
+    finally:
+        database.close()
+
+
+def bench_shoot(seed):
+    # a whole Game.shoot of the break: simulate, roll, render and write every frame
+    fresh_database().close()
+    game = Physics.Game(gameName="bench", player1Name="one", player2Name="two")
+    try:
+        before = database_bytes()
+        frames, table = game.shoot("bench", "one", break_table(seed), *BREAK_VELOCITY)
+        return {"frames": len(frames), "bytes": database_bytes() - before}
+    finally:
+        game.close()
+
+
+# name, function and the count its rate is of
+BENCHMARKS = [
+    ("segment", bench_segment, "events"),
+    ("segment_events", bench_segment_events, "events"),
+    ("segment_stepped", bench_segment_stepped, "events"),
+    ("roll", bench_roll, "frames"),
+    ("roll_frames", bench_roll_frames, "frames"),
+    ("svg", bench_svg, "frames"),
+    ("write_table", bench_write_table, "frames"),
+    ("read_table", bench_read_table, "frames"),
+    ("shoot", bench_shoot, "frames"),
+]
+
+
+def run(function, unit, seed, repeat):
+    """
+    Runs one benchmark repeat times and returns its best run: the counts it
+    gave, seconds and rate, with the peak traced memory of one more run.
+    """
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        counts = function(seed)
+        seconds = counts.pop("seconds", time.perf_counter() - start)
+        if best is None or seconds < best["seconds"]:
+            best = dict(counts, seconds=seconds)
+
+    tracemalloc.start()
+    try:
+        function(seed)
+        best["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    best["rate"] = best[unit] / best["seconds"] if best["seconds"] > 0 else 0.0
+    best["unit"] = unit + "/sec"
+    return best
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns a line for each benchmark whose rate fell more than tolerance
+    below its rate in baseline.
+    """
+    slower = []
+    for name, result in results["benchmarks"].items():
+        before = baseline.get("benchmarks", {}).get(name)
+        if before is None or not before.get("rate"):
+            continue
+        change = result["rate"] / before["rate"] - 1.0
+        result["change"] = change
+        if change < -tolerance:
+            slower.append("%s: %.1f %s, was %.1f (%+.1f%%)" % (
+                name, result["rate"], result["unit"], before["rate"], change * 100.0))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the physics, database and rendering paths.")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each benchmark, the best is kept")
+    parser.add_argument("--seed", type=int, default=2750, help="seed of the racked table")
+    parser.add_argument("--only", nargs="*", help="names of the benchmarks to run")
+    parser.add_argument("--out", help="file to write the JSON results to")
+    parser.add_argument("--baseline", nargs="?", const=BASELINE, help="results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="fraction a rate may fall")
+    args = parser.parse_args()
+
+    results = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "benchmarks": {},
+    }
+
+    # the database goes in a directory of its own
+    home = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="phylib-bench-")
+    os.chdir(workdir)
+    try:
+        for name, function, unit in BENCHMARKS:
+            if args.only and name not in args.only:
+                continue
+            results["benchmarks"][name] = run(function, unit, args.seed, args.repeat)
+            print("%-12s %12.1f %s" % (name, results["benchmarks"][name]["rate"], unit + "/sec"), file=sys.stderr)
+    finally:
+        Physics.ConnectionPool.shared().reset()
+        os.chdir(home)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    # how many times faster the event-driven segment is than stepping, on the same tables
+    benchmarks = results["benchmarks"]
+    mismatched = 0
+    if "segment_stepped" in benchmarks:
+        mismatched = benchmarks["segment_stepped"]["mismatched"]
+        if "segment_events" in benchmarks and benchmarks["segment_stepped"]["rate"]:
+            results["segment_speedup"] = benchmarks["segment_events"]["rate"] / benchmarks["segment_stepped"]["rate"]
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results["max_rss_bytes"] = maxrss if sys.platform == "darwin" else maxrss * 1024
+
+    slower = []
+    if args.baseline and not args.save_baseline:
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as file:
+                slower = compare(results, json.load(file), args.tolerance)
+            results["regressions"] = slower
+        else:
+            print("no baseline recorded at %s, not comparing (make one with --save-baseline)" % args.baseline,
+                  file=sys.stderr)
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as file:
+            file.write(text + "\n")
+    if args.save_baseline:
+        with open(args.baseline or BASELINE, "w") as file:
+            file.write(text + "\n")
+
+    for line in slower:
+        print("slower than the baseline: " + line, file=sys.stderr)
+    if mismatched:
+        print("segment and segment_stepped gave different tables from %d events" % mismatched, file=sys.stderr)
+    return 1 if slower or mismatched else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -47,11 +47,16 @@ $(document).ready(function() {
 
             console.log(`x velocity: ${velocityX}, y velocity: ${velocityY}`);
 
-            // Send the calculated velocity to the server
-            sendVelocityToServer(velocityX, velocityY);
-
-            // Check for animate.html content and navigate if available
-            navigateToAnimateHtmlIfNeeded();
+            if (window.fetch && window.ReadableStream && window.TextDecoder) {
+                // Play the shot and show its frames as the server streams them
+                streamShot(velocityX, velocityY);
+            } else {
+                // Send the calculated velocity to the server
+                sendVelocityToServer(velocityX, velocityY);
+
+                // Check for animate.html content and navigate if available
+                navigateToAnimateHtmlIfNeeded();
+            }
         }
     });
 
@@ -106,6 +111,101 @@ $(document).ready(function() {
         });
     }
 
+    // function to play a shot on the server and animate its frames as they arrive;
+    // the table is sent once and each frame is only the balls' numbers and positions
+    function streamShot(velocityX, velocityY) {
+        const SVG_NS = 'http://www.w3.org/2000/svg';
+        const frames = []; // frames received but not shown yet
+        let finished = false;
+        let radius = 0;
+        let colours = [];
+        const circles = {}; // the circle drawn for each ball number
+
+        // function to move the balls to where one frame has them
+        function drawFrame(balls) {
+            const svg = $('#svg_box svg')[0];
+            const seen = {};
+            for (let i = 0; i < balls.length; i += 3) {
+                const number = balls[i];
+                let circle = circles[number];
+                if (!circle) {
+                    circle = document.createElementNS(SVG_NS, 'circle');
+                    circle.setAttribute('r', radius);
+                    circle.setAttribute('fill', colours[number]);
+                    svg.appendChild(circle);
+                    circles[number] = circle;
+                }
+                circle.setAttribute('cx', balls[i + 1]);
+                circle.setAttribute('cy', balls[i + 2]);
+                seen[number] = true;
+            }
+
+            // Balls missing from the frame have been pocketed
+            for (const number in circles) {
+                if (!seen[number]) {
+                    circles[number].remove();
+                    delete circles[number];
+                }
+            }
+        }
+
+        // Show one frame every FRAME_MS, starting with the first to arrive
+        const FRAME_MS = 100;
+        const player = setInterval(function() {
+            if (frames.length > 0) {
+                drawFrame(frames.shift());
+            } else if (finished) {
+                clearInterval(player);
+
+                // Keep the last frame and put back the aiming line for the next shot
+                const line = document.createElementNS(SVG_NS, 'line');
+                $(line).attr({ id: 'line', x1: 0, y1: 0, x2: 0, y2: 0, stroke: 'black', 'stroke-width': 4 }).hide();
+                $('#svg_box svg').append(line);
+            }
+        }, FRAME_MS);
+
+        fetch('/stream', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ velocity_x: velocityX, velocity_y: velocityY, output: 'data' })
+        }).then(async function(response) {
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffered = '';
+
+            // Each line of the response is one JSON message
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) {
+                    break;
+                }
+                buffered += decoder.decode(value, { stream: true });
+                const lines = buffered.split('\n');
+                buffered = lines.pop();
+                for (const line of lines) {
+                    if (!line) {
+                        continue;
+                    }
+                    const message = JSON.parse(line);
+                    if (message.balls !== undefined) {
+                        frames.push(message.balls);
+                    } else if (message.table !== undefined) {
+                        // The table without balls, drawn once for the whole shot
+                        $('#svg_box').html(message.table.slice(message.table.indexOf('<svg')));
+                        radius = message.radius;
+                        colours = message.colours;
+                    } else if (message.error) {
+                        console.error("Shot failed:", message.error);
+                    }
+                }
+            }
+            finished = true;
+        }).catch(function(error) {
+            console.error("Error streaming the shot:", error);
+            finished = true;
+        });
+    }
+
     // function to check and navigate to animate.html if available
     function navigateToAnimateHtmlIfNeeded() {
         $.ajax({
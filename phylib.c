@@ -105,6 +105,22 @@ phylib_object *phylib_new_vcushion(double x)
 
 }
 
+/* Object in slot i (which must be in range) or NULL, for the hot loops */
+static inline phylib_object *phylib_slot(phylib_table *table, int i)
+{
+    if (table->mask[i / PHYLIB_MASK_BITS] & ((uint32_t)1 << (i % PHYLIB_MASK_BITS))) {
+        return &table->object[i];
+    }
+    return NULL;
+}
+
+/* Stores a copy of object in slot i of the table and marks it as used */
+static void phylib_place_object(phylib_table *table, int i, phylib_object object)
+{
+    table->object[i] = object;
+    table->mask[i / PHYLIB_MASK_BITS] |= (uint32_t)1 << (i % PHYLIB_MASK_BITS);
+}
+
 /* Creates a new pool table*/
 phylib_table *phylib_new_table(void)
 {
@@ -114,25 +130,22 @@ phylib_table *phylib_new_table(void)
         return NULL;
     }
 
+    // every slot starts out empty (and zeroed, so copies are deterministic)
+    memset(newTable, 0, sizeof(phylib_table));
     newTable->time = 0.0; // sets time to 0.0
 
-    // safety measure to ensure all object pointers are initally empty
-    for (int i = 0; i < PHYLIB_MAX_OBJECTS; i++) {
-        newTable->object[i] = NULL;
-    }
-
     // horizontal and vertical cushions
-    newTable->object[0] = phylib_new_hcushion(0.0); // top horizontal cushion
-    newTable->object[1] = phylib_new_hcushion(PHYLIB_TABLE_LENGTH); // bottom horizontal cushion
-    newTable->object[2] = phylib_new_vcushion(0.0); // left vertical cushion
-    newTable->object[3] = phylib_new_vcushion(PHYLIB_TABLE_WIDTH); // right vertical cushion
-
-    newTable->object[4] = phylib_new_hole(&(phylib_coord){0.0, 0.0}); // top-left corner
-    newTable->object[5] = phylib_new_hole(&(phylib_coord){0.0, PHYLIB_TABLE_LENGTH / 2.0}); // middle left hole
-    newTable->object[6] = phylib_new_hole(&(phylib_coord){0.0, PHYLIB_TABLE_LENGTH}); // bottom-left corner
-    newTable->object[7] = phylib_new_hole(&(phylib_coord){PHYLIB_TABLE_WIDTH, 0.0}); // top-right corner
-    newTable->object[8] = phylib_new_hole(&(phylib_coord){PHYLIB_TABLE_WIDTH, PHYLIB_TABLE_LENGTH / 2.0}); // middle right hole
-    newTable->object[9] = phylib_new_hole(&(phylib_coord){PHYLIB_TABLE_WIDTH, PHYLIB_TABLE_LENGTH}); // bottom-right corner
+    phylib_place_object(newTable, 0, (phylib_object){.type = PHYLIB_HCUSHION, .obj.hcushion = {0.0}}); // top horizontal cushion
+    phylib_place_object(newTable, 1, (phylib_object){.type = PHYLIB_HCUSHION, .obj.hcushion = {PHYLIB_TABLE_LENGTH}}); // bottom horizontal cushion
+    phylib_place_object(newTable, 2, (phylib_object){.type = PHYLIB_VCUSHION, .obj.vcushion = {0.0}}); // left vertical cushion
+    phylib_place_object(newTable, 3, (phylib_object){.type = PHYLIB_VCUSHION, .obj.vcushion = {PHYLIB_TABLE_WIDTH}}); // right vertical cushion
+
+    phylib_place_object(newTable, 4, (phylib_object){.type = PHYLIB_HOLE, .obj.hole = {{0.0, 0.0}}}); // top-left corner
+    phylib_place_object(newTable, 5, (phylib_object){.type = PHYLIB_HOLE, .obj.hole = {{0.0, PHYLIB_TABLE_LENGTH / 2.0}}}); // middle left hole
+    phylib_place_object(newTable, 6, (phylib_object){.type = PHYLIB_HOLE, .obj.hole = {{0.0, PHYLIB_TABLE_LENGTH}}}); // bottom-left corner
+    phylib_place_object(newTable, 7, (phylib_object){.type = PHYLIB_HOLE, .obj.hole = {{PHYLIB_TABLE_WIDTH, 0.0}}}); // top-right corner
+    phylib_place_object(newTable, 8, (phylib_object){.type = PHYLIB_HOLE, .obj.hole = {{PHYLIB_TABLE_WIDTH, PHYLIB_TABLE_LENGTH / 2.0}}}); // middle right hole
+    phylib_place_object(newTable, 9, (phylib_object){.type = PHYLIB_HOLE, .obj.hole = {{PHYLIB_TABLE_WIDTH, PHYLIB_TABLE_LENGTH}}}); // bottom-right corner
 
     return newTable;
     
@@ -165,47 +178,47 @@ phylib_table *phylib_copy_table(phylib_table *table)
         return NULL;
     }
 
-    // copy table properties
-    newTable->time = table->time;
-
-    // initialize all object pointers to NULL
-    for (int i = 0; i < PHYLIB_MAX_OBJECTS; i++) {
-        newTable->object[i] = NULL;
-    }
-
-    // copy each object in the table
-    for (int i = 0; i < PHYLIB_MAX_OBJECTS; i++) {
-        phylib_copy_object(&(newTable->object[i]),&(table->object[i]));
-       
-    }
+    // the objects live inside the table, so one copy takes everything
+    memcpy(newTable, table, sizeof(phylib_table));
 
     return newTable;
 }
 
+/* Copies the object into the first empty slot, the caller keeps object */
 void phylib_add_object(phylib_table *table, phylib_object *object)
 {
-    // iterates through each object until there is a NULL pointer
+    // iterates through each slot until there is an empty one
      for (int i = 0; i < PHYLIB_MAX_OBJECTS; i++) {
-        if (table->object[i] == NULL) {
-            table->object[i] = object;  // assigns pointer to address of object
+        if (phylib_slot(table, i) == NULL) {
+            phylib_place_object(table, i, *object);
             break; // function does nothing
         }
     }
     
 }
 
-// frees the table
-void phylib_free_table(phylib_table *table)
+/* Returns the object in slot i of the table, NULL if the slot is empty */
+phylib_object *phylib_get_object(phylib_table *table, int i)
 {
-    // frees each object in the table
-    for (int i = 0; i < PHYLIB_MAX_OBJECTS; i++) {
-        if (table->object[i] != NULL) {
-            free(table->object[i]);
-            table->object[i] = NULL;
-        }
+    if (i < 0 || i >= PHYLIB_MAX_OBJECTS) {
+        return NULL;
+    }
+    return phylib_slot(table, i);
+}
+
+/* Empties slot i of the table */
+void phylib_remove_object(phylib_table *table, int i)
+{
+    if (i >= 0 && i < PHYLIB_MAX_OBJECTS) {
+        table->mask[i / PHYLIB_MASK_BITS] &= ~((uint32_t)1 << (i % PHYLIB_MASK_BITS));
+        memset(&table->object[i], 0, sizeof(phylib_object));
     }
+}
 
-    free (table); // free the whole table
+// frees the table
+void phylib_free_table(phylib_table *table)
+{
+    free (table); // free the whole table, objects included
 }
 
 /* Returns the difference between c1 and c2 */
@@ -381,9 +394,8 @@ void phylib_bounce(phylib_object **a, phylib_object **b) {
         rollingBall->obj.rolling_ball.acc.x *= -1;
     }
 
-    // handle ball falling into a hole
+    // handle ball falling into a hole, the table that owns it empties the slot
     if (otherObject->type == PHYLIB_HOLE) {
-        free(*a);
         *a = NULL;
     }
 
@@ -430,9 +442,9 @@ void phylib_bounce(phylib_object **a, phylib_object **b) {
 }
 
 // returns the number of rolling balls on the table
-unsigned char phylib_rolling(phylib_table *t)
+int phylib_rolling(phylib_table *t)
 {
-    unsigned char count = 0; // Initialize a counter
+    int count = 0; // Initialize a counter
 
     // Check if the table pointer is null
     if (t == NULL) {
@@ -442,12 +454,14 @@ unsigned char phylib_rolling(phylib_table *t)
 
     // Initialize a for loop to iterate through each object in the table
     for (int i = 0; i < PHYLIB_MAX_OBJECTS; i++) {
+        phylib_object *object = phylib_slot(t, i);
+
         // Checks if object exists
-        if (t->object[i] != NULL) {
+        if (object != NULL) {
          //   printf("Object %d exists. ", i); // Debugging statement
 
             // Check if it's a rolling ball
-            if (t->object[i]->type == PHYLIB_ROLLING_BALL) {
+            if (object->type == PHYLIB_ROLLING_BALL) {
                 count++;
             } else {
             }
@@ -458,57 +472,981 @@ unsigned char phylib_rolling(phylib_table *t)
     return count; // Returns total number of balls
 }
 
-phylib_table *phylib_segment(phylib_table * table) {
-    
+/* Returns the number of balls (still or rolling) on the table */
+int phylib_count_balls(phylib_table *table)
+{
+    int count = 0;
+
+    for (int i = 0; i < PHYLIB_MAX_OBJECTS; i++) {
+        phylib_object *object = phylib_slot(table, i);
+        if (object != NULL && (object->type == PHYLIB_STILL_BALL || object->type == PHYLIB_ROLLING_BALL)) {
+            count++;
+        }
+    }
+
+    return count;
+}
+
+/* Rolls the balls of the table to each of the ntimes times and writes one
+   row of PHYLIB_FRAME_FIELDS values (number, x, y, type, xvel, yvel) per
+   ball, frame after frame and balls in slot order, into frames. frames must
+   hold ntimes * phylib_count_balls(table) rows. Returns the balls per frame */
+int phylib_roll_frames(phylib_table *table, const double *times, int ntimes, double *frames)
+{
+    int nballs = phylib_count_balls(table);
+    phylib_object rolled;
+
+    for (int f = 0; f < ntimes; f++) {
+        double *row = frames + (size_t)f * nballs * PHYLIB_FRAME_FIELDS;
+
+        for (int i = 0; i < PHYLIB_MAX_OBJECTS; i++) {
+            phylib_object *object = phylib_slot(table, i);
+            if (object == NULL) {
+                continue;
+            }
+
+            if (object->type == PHYLIB_ROLLING_BALL) {
+                // same result as rolling a fresh ball with phylib_roll
+                rolled.type = PHYLIB_ROLLING_BALL;
+                phylib_roll(&rolled, object, times[f]);
+                row[0] = object->obj.rolling_ball.number;
+                row[1] = rolled.obj.rolling_ball.pos.x;
+                row[2] = rolled.obj.rolling_ball.pos.y;
+                row[3] = PHYLIB_ROLLING_BALL;
+                row[4] = rolled.obj.rolling_ball.vel.x;
+                row[5] = rolled.obj.rolling_ball.vel.y;
+            } else if (object->type == PHYLIB_STILL_BALL) {
+                row[0] = object->obj.still_ball.number;
+                row[1] = object->obj.still_ball.pos.x;
+                row[2] = object->obj.still_ball.pos.y;
+                row[3] = PHYLIB_STILL_BALL;
+                row[4] = 0.0;
+                row[5] = 0.0;
+            } else {
+                continue;
+            }
+            row += PHYLIB_FRAME_FIELDS;
+        }
+    }
+
+    return nballs;
+}
+
+/* Writes one row of PHYLIB_SNAPSHOT_FIELDS values (type, number, x, y,
+   xvel, yvel, xacc, yacc, slot) per ball, in slot order, into rows, which
+   must hold phylib_count_balls(table) rows. Still balls have zero velocity
+   and acceleration. Returns the number of balls */
+int phylib_snapshot(phylib_table *table, double *rows)
+{
+    int nballs = 0;
+
+    for (int i = 0; i < PHYLIB_MAX_OBJECTS; i++) {
+        phylib_object *object = phylib_slot(table, i);
+        if (object == NULL) {
+            continue;
+        }
+
+        if (object->type == PHYLIB_ROLLING_BALL) {
+            phylib_rolling_ball *ball = &object->obj.rolling_ball;
+            rows[0] = PHYLIB_ROLLING_BALL;
+            rows[1] = ball->number;
+            rows[2] = ball->pos.x;
+            rows[3] = ball->pos.y;
+            rows[4] = ball->vel.x;
+            rows[5] = ball->vel.y;
+            rows[6] = ball->acc.x;
+            rows[7] = ball->acc.y;
+        } else if (object->type == PHYLIB_STILL_BALL) {
+            phylib_still_ball *ball = &object->obj.still_ball;
+            rows[0] = PHYLIB_STILL_BALL;
+            rows[1] = ball->number;
+            rows[2] = ball->pos.x;
+            rows[3] = ball->pos.y;
+            rows[4] = rows[5] = rows[6] = rows[7] = 0.0;
+        } else {
+            continue;
+        }
+        rows[8] = i;
+        rows += PHYLIB_SNAPSHOT_FIELDS;
+        nballs++;
+    }
+
+    return nballs;
+}
+
+/* Adds a ball for each of nballs rows of PHYLIB_FRAME_FIELDS values
+   (number, x, y, type, xvel, yvel) to the empty slots of the table, in the
+   slots phylib_add_object would give them one at a time. A row of type
+   PHYLIB_ROLLING_BALL is a rolling ball with drag against its velocity,
+   any other a still ball. Returns the balls added, fewer than nballs once
+   the table is full */
+int phylib_add_balls(phylib_table *table, const double *rows, int nballs)
+{
+    int slot = 0;
+    int added;
+
+    for (added = 0; added < nballs; added++, rows += PHYLIB_FRAME_FIELDS) {
+        while (slot < PHYLIB_MAX_OBJECTS && phylib_slot(table, slot) != NULL) {
+            slot++;
+        }
+        if (slot == PHYLIB_MAX_OBJECTS) {
+            break; // no room for the rest
+        }
+
+        phylib_object object;
+        memset(&object, 0, sizeof(object));
+
+        if ((int)rows[3] == PHYLIB_ROLLING_BALL) {
+            phylib_rolling_ball *ball = &object.obj.rolling_ball;
+            object.type = PHYLIB_ROLLING_BALL;
+            ball->number = (unsigned char)rows[0];
+            ball->pos.x = rows[1];
+            ball->pos.y = rows[2];
+            ball->vel.x = rows[4];
+            ball->vel.y = rows[5];
+
+            double speed = phylib_length(ball->vel);
+            if (speed != 0.0) {
+                ball->acc.x = -ball->vel.x / speed * PHYLIB_DRAG;
+                ball->acc.y = -ball->vel.y / speed * PHYLIB_DRAG;
+            }
+        } else {
+            object.type = PHYLIB_STILL_BALL;
+            object.obj.still_ball.number = (unsigned char)rows[0];
+            object.obj.still_ball.pos.x = rows[1];
+            object.obj.still_ball.pos.y = rows[2];
+        }
+
+        phylib_place_object(table, slot, object);
+    }
+
+    return added;
+}
+
+/* Copies n doubles to or from a packed table, which need not be aligned */
+static unsigned char *phylib_put_doubles(unsigned char *out, const double *values, int n)
+{
+    memcpy(out, values, sizeof(double) * n);
+    return out + sizeof(double) * n;
+}
+
+static const unsigned char *phylib_get_doubles(const unsigned char *in, double *values, int n)
+{
+    memcpy(values, in, sizeof(double) * n);
+    return in + sizeof(double) * n;
+}
+
+/* Packs the table into out, which must hold PHYLIB_PACKED_MAX bytes: a
+   PHYLIB_PACKED_HEADER byte header ('P', 'T', version, flags, the object
+   count as two bytes, two spare bytes, the time) and then every object in
+   slot order as its slot (two bytes), type, and its fields: a still ball's
+   number and position, a rolling ball's number, position, velocity and
+   acceleration, a hole's position or a cushion's coordinate. The count and
+   slots are little endian and the doubles are copied as they are, so
+   unpacking gives back exactly the same values on a machine of the same
+   byte order. Returns the bytes written */
+size_t phylib_pack_table(phylib_table *table, unsigned char flags, unsigned char *out)
+{
+    unsigned char *at = out + PHYLIB_PACKED_HEADER;
+    int count = 0;
+
+    for (int i = 0; i < PHYLIB_MAX_OBJECTS; i++) {
+        phylib_object *object = phylib_slot(table, i);
+        if (object == NULL) {
+            continue;
+        }
+
+        *at++ = i & 0xFF;
+        *at++ = (i >> 8) & 0xFF;
+        *at++ = (unsigned char)object->type;
+
+        switch (object->type) {
+            case PHYLIB_STILL_BALL:
+                *at++ = object->obj.still_ball.number;
+                at = phylib_put_doubles(at, &object->obj.still_ball.pos.x, 1);
+                at = phylib_put_doubles(at, &object->obj.still_ball.pos.y, 1);
+                break;
+            case PHYLIB_ROLLING_BALL: {
+                phylib_rolling_ball *ball = &object->obj.rolling_ball;
+                double values[6] = {ball->pos.x, ball->pos.y, ball->vel.x, ball->vel.y, ball->acc.x, ball->acc.y};
+                *at++ = ball->number;
+                at = phylib_put_doubles(at, values, 6);
+                break;
+            }
+            case PHYLIB_HOLE:
+                at = phylib_put_doubles(at, &object->obj.hole.pos.x, 1);
+                at = phylib_put_doubles(at, &object->obj.hole.pos.y, 1);
+                break;
+            case PHYLIB_HCUSHION:
+                at = phylib_put_doubles(at, &object->obj.hcushion.y, 1);
+                break;
+            case PHYLIB_VCUSHION:
+                at = phylib_put_doubles(at, &object->obj.vcushion.x, 1);
+                break;
+        }
+        count++;
+    }
+
+    out[0] = 'P';
+    out[1] = 'T';
+    out[2] = PHYLIB_PACKED_VERSION;
+    out[3] = flags;
+    out[4] = count & 0xFF;
+    out[5] = (count >> 8) & 0xFF;
+    out[6] = 0;
+    out[7] = 0;
+    phylib_put_doubles(out + 8, &table->time, 1);
+
+    return (size_t)(at - out);
+}
+
+/* Replaces everything on the table with the size bytes of a table packed by
+   phylib_pack_table, and sets flags to the flags it was packed with.
+   Returns 0, or -1 (leaving the table empty) if the data is not a packed
+   table this build can hold */
+int phylib_unpack_table(phylib_table *table, const unsigned char *data, size_t size, unsigned char *flags)
+{
+    const unsigned char *at = data + PHYLIB_PACKED_HEADER;
+    const unsigned char *end = data + size;
+
+    memset(table, 0, sizeof(phylib_table));
+    if (size < PHYLIB_PACKED_HEADER || data[0] != 'P' || data[1] != 'T' || data[2] != PHYLIB_PACKED_VERSION) {
+        return -1;
+    }
+    *flags = data[3];
+    int count = data[4] | (data[5] << 8);
+    int read = 0;
+    phylib_get_doubles(data + 8, &table->time, 1);
+
+    while (read < count) {
+        phylib_object object;
+        memset(&object, 0, sizeof(object));
+
+        if (end - at < 3) {
+            break;
+        }
+        int slot = at[0] | (at[1] << 8);
+        object.type = (phylib_obj)at[2];
+        at += 3;
+
+        // bytes of the fields after the slot and type
+        size_t need;
+        switch (object.type) {
+            case PHYLIB_STILL_BALL: need = 1 + 2 * sizeof(double); break;
+            case PHYLIB_ROLLING_BALL: need = 1 + 6 * sizeof(double); break;
+            case PHYLIB_HOLE: need = 2 * sizeof(double); break;
+            case PHYLIB_HCUSHION:
+            case PHYLIB_VCUSHION: need = sizeof(double); break;
+            default: need = 0; break;
+        }
+        if (need == 0 || (size_t)(end - at) < need || slot >= PHYLIB_MAX_OBJECTS || phylib_slot(table, slot) != NULL) {
+            break;
+        }
+
+        switch (object.type) {
+            case PHYLIB_STILL_BALL:
+                object.obj.still_ball.number = *at++;
+                at = phylib_get_doubles(at, &object.obj.still_ball.pos.x, 1);
+                at = phylib_get_doubles(at, &object.obj.still_ball.pos.y, 1);
+                break;
+            case PHYLIB_ROLLING_BALL: {
+                phylib_rolling_ball *ball = &object.obj.rolling_ball;
+                double values[6];
+                ball->number = *at++;
+                at = phylib_get_doubles(at, values, 6);
+                ball->pos.x = values[0];
+                ball->pos.y = values[1];
+                ball->vel.x = values[2];
+                ball->vel.y = values[3];
+                ball->acc.x = values[4];
+                ball->acc.y = values[5];
+                break;
+            }
+            case PHYLIB_HOLE:
+                at = phylib_get_doubles(at, &object.obj.hole.pos.x, 1);
+                at = phylib_get_doubles(at, &object.obj.hole.pos.y, 1);
+                break;
+            case PHYLIB_HCUSHION:
+                at = phylib_get_doubles(at, &object.obj.hcushion.y, 1);
+                break;
+            case PHYLIB_VCUSHION:
+                at = phylib_get_doubles(at, &object.obj.vcushion.x, 1);
+                break;
+        }
+        phylib_place_object(table, slot, object);
+        read++;
+    }
+
+    // every object must have been read, and nothing may follow them
+    if (read != count || at != end) {
+        memset(table, 0, sizeof(phylib_table));
+        return -1;
+    }
+    return 0;
+}
+
+/* Cell range covered by [lo,hi] along one axis, clamped to the grid so
+   objects off the table land in the border cells */
+static void phylib_grid_span(double lo, double hi, int cells, int *first, int *last)
+{
+    double limit = cells * PHYLIB_GRID_CELL;
+
+    *first = (lo <= 0.0) ? 0 : (lo >= limit) ? cells - 1 : (int)(lo / PHYLIB_GRID_CELL);
+    *last = (hi <= 0.0) ? 0 : (hi >= limit) ? cells - 1 : (int)(hi / PHYLIB_GRID_CELL);
+}
+
+/* Box of ball centres that can touch a static object, 0 if it is not static */
+static int phylib_grid_reach(phylib_object *object, double box[4])
+{
+    switch (object->type) {
+        case PHYLIB_STILL_BALL:
+            box[0] = object->obj.still_ball.pos.x - PHYLIB_BALL_DIAMETER;
+            box[1] = object->obj.still_ball.pos.y - PHYLIB_BALL_DIAMETER;
+            box[2] = object->obj.still_ball.pos.x + PHYLIB_BALL_DIAMETER;
+            box[3] = object->obj.still_ball.pos.y + PHYLIB_BALL_DIAMETER;
+            return 1;
+
+        case PHYLIB_HOLE:
+            box[0] = object->obj.hole.pos.x - PHYLIB_HOLE_RADIUS;
+            box[1] = object->obj.hole.pos.y - PHYLIB_HOLE_RADIUS;
+            box[2] = object->obj.hole.pos.x + PHYLIB_HOLE_RADIUS;
+            box[3] = object->obj.hole.pos.y + PHYLIB_HOLE_RADIUS;
+            return 1;
+
+        case PHYLIB_HCUSHION:
+            box[0] = -HUGE_VAL;
+            box[1] = object->obj.hcushion.y - PHYLIB_BALL_RADIUS;
+            box[2] = HUGE_VAL;
+            box[3] = object->obj.hcushion.y + PHYLIB_BALL_RADIUS;
+            return 1;
+
+        case PHYLIB_VCUSHION:
+            box[0] = object->obj.vcushion.x - PHYLIB_BALL_RADIUS;
+            box[1] = -HUGE_VAL;
+            box[2] = object->obj.vcushion.x + PHYLIB_BALL_RADIUS;
+            box[3] = HUGE_VAL;
+            return 1;
+
+        default:
+            return 0;
+    }
+}
+
+/* Builds the broad phase for the objects of a table: still balls, holes and cushions
+   are binned into every cell they can be touched from, rolling balls are
+   listed in moving. Returns 0 if memory could not be allocated */
+int phylib_grid_build(phylib_grid *grid, phylib_table *table)
+{
+    int count = PHYLIB_MAX_OBJECTS;
+    double box[4];
+    int x0, x1, y0, y1;
+    int entries = 0;
+
+    // counts the entries first so everything fits in one allocation
+    for (int i = 0; i < count; i++) {
+        phylib_object *object = phylib_slot(table, i);
+        if (object != NULL && phylib_grid_reach(object, box)) {
+            phylib_grid_span(box[0], box[2], PHYLIB_GRID_COLS, &x0, &x1);
+            phylib_grid_span(box[1], box[3], PHYLIB_GRID_ROWS, &y0, &y1);
+            entries += (x1 - x0 + 1) * (y1 - y0 + 1);
+        }
+    }
+
+    grid->memory = malloc(sizeof(int) * (2 * entries + 3 * count + 1));
+    if (grid->memory == NULL) {
+        return 0;
+    }
+    grid->next = grid->memory;
+    grid->index = grid->next + entries;
+    grid->mark = grid->index + entries;
+    grid->moving = grid->mark + count;
+    grid->found = grid->moving + count;
+    grid->table = table;
+    grid->nmoving = 0;
+    grid->query = 0;
+
+    for (int c = 0; c < PHYLIB_GRID_ROWS * PHYLIB_GRID_COLS; c++) {
+        grid->cells[c] = -1;
+    }
+
+    entries = 0;
+    for (int i = 0; i < count; i++) {
+        phylib_object *object = phylib_slot(table, i);
+
+        grid->mark[i] = 0;
+        if (object == NULL) {
+            continue;
+        }
+
+        if (object->type == PHYLIB_ROLLING_BALL) {
+            grid->moving[grid->nmoving++] = i;
+        } else if (phylib_grid_reach(object, box)) {
+            phylib_grid_span(box[0], box[2], PHYLIB_GRID_COLS, &x0, &x1);
+            phylib_grid_span(box[1], box[3], PHYLIB_GRID_ROWS, &y0, &y1);
+
+            // pushes the object on the front of every cell it covers
+            for (int y = y0; y <= y1; y++) {
+                for (int x = x0; x <= x1; x++) {
+                    int cell = y * PHYLIB_GRID_COLS + x;
+                    grid->index[entries] = i;
+                    grid->next[entries] = grid->cells[cell];
+                    grid->cells[cell] = entries++;
+                }
+            }
+        }
+    }
+
+    return 1;
+}
+
+/* Collects the static objects a ball centre inside the box could touch into
+   grid->found, each once. Returns how many were found */
+int phylib_grid_query(phylib_grid *grid, double x0, double y0, double x1, double y1)
+{
+    int cx0, cx1, cy0, cy1;
+    int found = 0;
+
+    phylib_grid_span(x0, x1, PHYLIB_GRID_COLS, &cx0, &cx1);
+    phylib_grid_span(y0, y1, PHYLIB_GRID_ROWS, &cy0, &cy1);
+    grid->query++;
+
+    for (int y = cy0; y <= cy1; y++) {
+        for (int x = cx0; x <= cx1; x++) {
+            for (int e = grid->cells[y * PHYLIB_GRID_COLS + x]; e != -1; e = grid->next[e]) {
+                int i = grid->index[e];
+                if (grid->mark[i] != grid->query) {
+                    grid->mark[i] = grid->query;
+                    grid->found[found++] = i;
+                }
+            }
+        }
+    }
+
+    return found;
+}
+
+/* Releases the memory of a grid built by phylib_grid_build */
+void phylib_grid_free(phylib_grid *grid)
+{
+    free(grid->memory);
+    grid->memory = NULL;
+}
+
+/* Bounding box of a rolling ball's centre between times t0 and t1 */
+static void phylib_swept_box(phylib_object *object, double t0, double t1, double box[4])
+{
+    phylib_rolling_ball *ball = &object->obj.rolling_ball;
+    double p[2] = {ball->pos.x, ball->pos.y};
+    double v[2] = {ball->vel.x, ball->vel.y};
+    double a[2] = {ball->acc.x, ball->acc.y};
+
+    for (int axis = 0; axis < 2; axis++) {
+        double start = p[axis] + v[axis] * t0 + 0.5 * a[axis] * t0 * t0;
+        double end = p[axis] + v[axis] * t1 + 0.5 * a[axis] * t1 * t1;
+        box[axis] = fmin(start, end);
+        box[axis + 2] = fmax(start, end);
+
+        // the turning point of the parabola can lie between the ends
+        if (a[axis] != 0.0) {
+            double turn = -v[axis] / a[axis];
+            if (turn > t0 && turn < t1) {
+                double peak = p[axis] + v[axis] * turn + 0.5 * a[axis] * turn * turn;
+                box[axis] = fmin(box[axis], peak);
+                box[axis + 2] = fmax(box[axis + 2], peak);
+            }
+        }
+    }
+}
+
+/* Rolls every rolling ball of table to time into copy and looks for the first
+   ball that stopped or touched another object. Returns 1 if an event was
+   applied to copy, 0 otherwise. Without a grid every object is checked */
+static int phylib_step(phylib_table *copiedTable, phylib_table *table, double time, phylib_grid *grid)
+{
+    // updates all rolling balls on table
+    for (int i = 0; i < PHYLIB_MAX_OBJECTS; i++) {
+        phylib_object *ball = phylib_slot(copiedTable, i);
+        if (ball != NULL && ball->type == PHYLIB_ROLLING_BALL){
+            phylib_roll(ball, phylib_slot(table, i), time);
+        }
+    }
+
+    for (int j = 0; j < PHYLIB_MAX_OBJECTS; j++) {
+        phylib_object *ball = phylib_slot(copiedTable, j);
+        if (ball != NULL && ball->type == PHYLIB_ROLLING_BALL){
+            // calls stopped function to see if the rolling ball stopped
+            if (phylib_stopped(ball) == 1){
+                return 1;
+            }
+
+            int n = 0;
+            if (grid != NULL) {
+                // only the objects around the ball and the other rolling balls
+                n = phylib_grid_query(grid, ball->obj.rolling_ball.pos.x, ball->obj.rolling_ball.pos.y,
+                                      ball->obj.rolling_ball.pos.x, ball->obj.rolling_ball.pos.y);
+                for (int m = 0; m < grid->nmoving; m++) {
+                    grid->found[n++] = grid->moving[m];
+                }
+
+                // checks them in slot order, the same order as the full scan
+                for (int a = 1; a < n; a++) {
+                    int k = grid->found[a];
+                    int b = a;
+                    for (; b > 0 && grid->found[b - 1] > k; b--) {
+                        grid->found[b] = grid->found[b - 1];
+                    }
+                    grid->found[b] = k;
+                }
+            }
+
+            for (int m = 0; m < (grid != NULL ? n : PHYLIB_MAX_OBJECTS); m++) {
+                int k = (grid != NULL) ? grid->found[m] : m;
+                phylib_object *other = phylib_slot(copiedTable, k);
+
+                // loops end in case the space between balls is less than 0
+                if (other != NULL && j != k && (0.0 > phylib_distance(ball, other))) {
+
+                    // calls bounce before returning copy of table
+                    phylib_bounce(&ball, &other);
+                    if (ball == NULL) {
+                        phylib_remove_object(copiedTable, j); // fell into a hole
+                    }
+                    return 1;
+                }
+            }
+        }
+    }
+
+    return 0;
+}
+
+/* Reference simulation: advances time in PHYLIB_SIM_RATE steps until the
+   first event. Kept to check phylib_segment against */
+phylib_table *phylib_segment_stepped(phylib_table *table) {
+
     double time = PHYLIB_SIM_RATE; // initalizes time to simulation rate
-    
+
     // returns null if there are no rolling balls
     if (phylib_rolling(table) == 0) {
         return NULL;
     }
-  
+
     // calls copyTable in order to copy a table
     phylib_table *copiedTable = phylib_copy_table(table);
+    if (copiedTable == NULL) {
+        return NULL;
+    }
 
     // simulates until max time is reached
     while (PHYLIB_MAX_TIME > time) {
-        
-        // updates all rolling balls on table
-        for (int i = 0; i < PHYLIB_MAX_OBJECTS; i++) {
-            if (copiedTable->object[i] != NULL && copiedTable->object[i]->type == PHYLIB_ROLLING_BALL){
-                phylib_roll(copiedTable->object[i], table->object[i], time);
+
+        if (phylib_step(copiedTable, table, time, NULL) == 1) {
+            copiedTable->time = copiedTable->time + time;
+            return copiedTable;
+        }
+
+        // increments time by PHYLIB_SIM_RATE
+        time += PHYLIB_SIM_RATE;
+    }
+
+    // updates the copy's time and returns it
+    copiedTable->time = copiedTable->time + time;
+    return copiedTable;
+}
+
+/* Evaluates c[0] + c[1]*t + ... + c[degree]*t^degree */
+static double phylib_poly_eval(const double *c, int degree, double t)
+{
+    double result = 0.0;
+    for (int i = degree; i >= 0; i--) {
+        result = result * t + c[i];
+    }
+    return result;
+}
+
+/* Narrows [a,b] down to the sign change of the polynomial inside it */
+static double phylib_poly_bisect(const double *c, int degree, double a, double b, double fa)
+{
+    for (int i = 0; i < 100; i++) {
+        double m = 0.5 * (a + b);
+        if (m <= a || m >= b) {
+            break; // interval can not get any smaller
+        }
+
+        double fm = phylib_poly_eval(c, degree, m);
+        if ((fm < 0.0) == (fa < 0.0)) {
+            a = m;
+            fa = fm;
+        } else {
+            b = m;
+        }
+    }
+    return b;
+}
+
+/* Finds the real roots (in increasing order) of a polynomial of degree
+   PHYLIB_POLY_DEGREE or less inside [lo,hi]. The interval is split at the
+   roots of the derivative so every piece is monotone and can be bisected.
+   Returns the number of roots written to roots */
+static int phylib_poly_roots(const double *c, int degree, double lo, double hi, double *roots)
+{
+    double deriv[PHYLIB_POLY_DEGREE] = {0.0};
+    double crit[PHYLIB_POLY_DEGREE + 1];
+    int count = 0;
+
+    // leading zeros do not change the roots
+    while (degree > 0 && c[degree] == 0.0) {
+        degree--;
+    }
+    if (degree == 0 || lo > hi) {
+        return 0;
+    }
+
+    for (int i = 1; i <= degree; i++) {
+        deriv[i - 1] = i * c[i];
+    }
+    int ncrit = phylib_poly_roots(deriv, degree - 1, lo, hi, crit);
+
+    double a = lo;
+    double fa = phylib_poly_eval(c, degree, a);
+    if (fa == 0.0) {
+        roots[count++] = a;
+    }
+
+    // walks the monotone pieces between the critical points
+    for (int i = 0; i <= ncrit; i++) {
+        double b = (i < ncrit) ? crit[i] : hi;
+        double fb = phylib_poly_eval(c, degree, b);
+
+        if (fb == 0.0) {
+            roots[count++] = b;
+        } else if (fa * fb < 0.0) {
+            roots[count++] = phylib_poly_bisect(c, degree, a, b, fa);
+        }
+
+        a = b;
+        fa = fb;
+    }
+
+    return count;
+}
+
+/* Returns the earliest time in [lo,hi] at which the polynomial is negative,
+   or INFINITY if it stays non-negative */
+static double phylib_poly_first_negative(const double *c, int degree, double lo, double hi)
+{
+    double roots[PHYLIB_POLY_DEGREE + 1];
+
+    if (phylib_poly_eval(c, degree, lo) < 0.0) {
+        return lo;
+    }
+    if (phylib_poly_roots(c, degree, lo, hi, roots) > 0) {
+        return roots[0];
+    }
+    return INFINITY;
+}
+
+/* Writes the position of an object along one axis as a polynomial in time */
+static void phylib_axis_poly(phylib_object *object, int axis, double p[3])
+{
+    if (object->type == PHYLIB_ROLLING_BALL) {
+        phylib_rolling_ball *ball = &object->obj.rolling_ball;
+        p[0] = axis ? ball->pos.y : ball->pos.x;
+        p[1] = axis ? ball->vel.y : ball->vel.x;
+        p[2] = 0.5 * (axis ? ball->acc.y : ball->acc.x);
+    } else if (object->type == PHYLIB_STILL_BALL) {
+        p[0] = axis ? object->obj.still_ball.pos.y : object->obj.still_ball.pos.x;
+        p[1] = 0.0;
+        p[2] = 0.0;
+    } else {
+        p[0] = axis ? object->obj.hole.pos.y : object->obj.hole.pos.x;
+        p[1] = 0.0;
+        p[2] = 0.0;
+    }
+}
+
+/* Adds the square of a quadratic to a quartic */
+static void phylib_add_square(const double q[3], double out[PHYLIB_POLY_DEGREE + 1])
+{
+    out[0] += q[0] * q[0];
+    out[1] += 2.0 * q[0] * q[1];
+    out[2] += q[1] * q[1] + 2.0 * q[0] * q[2];
+    out[3] += 2.0 * q[1] * q[2];
+    out[4] += q[2] * q[2];
+}
+
+/* Earliest time in [lo,hi] at which phylib_distance(ball, other) becomes
+   negative, with both objects moving along their current trajectories */
+static double phylib_contact_time(phylib_object *ball, phylib_object *other, double lo, double hi)
+{
+    double h[PHYLIB_POLY_DEGREE + 1] = {0.0, 0.0, 0.0, 0.0, 0.0};
+    double a[3], b[3], d[3];
+    double reach;
+
+    switch (other->type) {
+        case PHYLIB_HCUSHION:
+        case PHYLIB_VCUSHION:
+            // squared gap between the ball centre and the cushion line
+            phylib_axis_poly(ball, other->type == PHYLIB_HCUSHION, d);
+            d[0] -= (other->type == PHYLIB_HCUSHION) ? other->obj.hcushion.y : other->obj.vcushion.x;
+            phylib_add_square(d, h);
+            reach = PHYLIB_BALL_RADIUS;
+            break;
+
+        case PHYLIB_HOLE:
+        case PHYLIB_STILL_BALL:
+        case PHYLIB_ROLLING_BALL:
+            // squared distance between the two centres
+            for (int axis = 0; axis < 2; axis++) {
+                phylib_axis_poly(ball, axis, a);
+                phylib_axis_poly(other, axis, b);
+                for (int i = 0; i < 3; i++) {
+                    d[i] = a[i] - b[i];
+                }
+                phylib_add_square(d, h);
             }
-        }   
-
-            for (int j = 0; j < PHYLIB_MAX_OBJECTS; j++) {
-                if (copiedTable->object[j] != NULL && copiedTable->object[j]->type == PHYLIB_ROLLING_BALL){
-                // calls stopped function to see if the rolling ball stopped 
-                    if (phylib_stopped(copiedTable->object[j]) == 1){
-                        copiedTable->time = copiedTable->time + time;
-                        return copiedTable;
-                    }
-    
-                    for (int k = 0; k < PHYLIB_MAX_OBJECTS; k++){
-                        // loops end in case the space between balls is less than 0
-                        if (copiedTable->object[k] != NULL && j != k && (0.0 > phylib_distance(copiedTable->object[j], copiedTable->object[k]))) {
-                            
-                            // calls bounce before returning copy of table
-                            phylib_bounce(&copiedTable->object[j], &copiedTable->object[k]);
-                            copiedTable->time = copiedTable->time + time;
-                            return copiedTable;
-                        } 
-                    }   
+            reach = (other->type == PHYLIB_HOLE) ? PHYLIB_HOLE_RADIUS : PHYLIB_BALL_DIAMETER;
+            break;
+
+        default:
+            return INFINITY;
+    }
+
+    h[0] -= reach * reach;
+    return phylib_poly_first_negative(h, PHYLIB_POLY_DEGREE, lo, hi);
+}
+
+/* Earliest time in [lo,hi] at which phylib_stopped would convert the ball,
+   following the per-axis velocity clamping of phylib_roll */
+static double phylib_stop_time(phylib_object *object, double lo, double hi)
+{
+    phylib_rolling_ball *ball = &object->obj.rolling_ball;
+    double v[2] = {ball->vel.x, ball->vel.y};
+    double a[2] = {ball->acc.x, ball->acc.y};
+    double clamp[2];
+
+    // an axis is clamped to zero once its velocity changes sign
+    for (int axis = 0; axis < 2; axis++) {
+        clamp[axis] = (v[axis] * a[axis] < 0.0) ? -v[axis] / a[axis] : INFINITY;
+    }
+
+    double breaks[3] = {fmin(clamp[0], clamp[1]), fmax(clamp[0], clamp[1]), INFINITY};
+    double start = 0.0;
+
+    // speed^2 - epsilon^2 is a quadratic on each piece between clamps
+    for (int piece = 0; piece < 3 && start < hi; piece++) {
+        double end = fmin(breaks[piece], hi);
+        double s[3] = {-PHYLIB_VEL_EPSILON * PHYLIB_VEL_EPSILON, 0.0, 0.0};
+
+        for (int axis = 0; axis < 2; axis++) {
+            if (clamp[axis] > start) {
+                s[0] += v[axis] * v[axis];
+                s[1] += 2.0 * v[axis] * a[axis];
+                s[2] += a[axis] * a[axis];
+            }
+        }
+
+        double from = fmax(start, lo);
+        if (from <= end) {
+            double t = phylib_poly_first_negative(s, 2, from, end);
+            if (t <= end) {
+                return t;
+            }
+        }
+        start = end;
+    }
+
+    return INFINITY;
+}
+
+/* Solves for the earliest time no sooner than lo at which a rolling ball
+   of table stops or touches another object. Time is swept in growing windows
+   so each ball is only solved against what the grid puts near its path */
+static double phylib_next_event(phylib_table *table, phylib_grid *grid, double lo)
+{
+    double best = PHYLIB_MAX_TIME;
+    double speed = PHYLIB_VEL_EPSILON;
+    double box[4], other[4];
+
+    // stopping times bound how far every other check has to look
+    for (int m = 0; m < grid->nmoving; m++) {
+        phylib_object *ball = phylib_slot(table, grid->moving[m]);
+        best = fmin(best, phylib_stop_time(ball, lo, best));
+        speed = fmax(speed, phylib_length(ball->obj.rolling_ball.vel));
+    }
+
+    // the first window lets the fastest ball cross about one cell
+    double width = fmax(PHYLIB_GRID_CELL / speed, PHYLIB_SIM_RATE);
+
+    for (double start = lo; start < best; start += width, width *= 2.0) {
+        double end = fmin(start + width, best);
+
+        for (int m = 0; m < grid->nmoving; m++) {
+            phylib_object *ball = phylib_slot(table, grid->moving[m]);
+            phylib_swept_box(ball, start, end, box);
+
+            int n = phylib_grid_query(grid, box[0], box[1], box[2], box[3]);
+            for (int f = 0; f < n; f++) {
+                best = fmin(best, phylib_contact_time(ball, phylib_slot(table, grid->found[f]), start, end));
+            }
+
+            // rolling pairs are solved once, when their paths come close
+            for (int o = m + 1; o < grid->nmoving; o++) {
+                phylib_object *next = phylib_slot(table, grid->moving[o]);
+                phylib_swept_box(next, start, end, other);
+                if (box[0] - PHYLIB_BALL_DIAMETER <= other[2] && other[0] <= box[2] + PHYLIB_BALL_DIAMETER &&
+                    box[1] - PHYLIB_BALL_DIAMETER <= other[3] && other[1] <= box[3] + PHYLIB_BALL_DIAMETER) {
+                    best = fmin(best, phylib_contact_time(ball, next, start, end));
                 }
-      
             }
+        }
 
-                // increments time by PHYLIB_SIM_RATE
-                time += PHYLIB_SIM_RATE;
-        } 
+        // nothing before this window, so an event inside it is the earliest
+        if (best <= end) {
+            break;
+        }
+    }
+
+    return best;
+}
+
+/* Simulates the segment that starts at table into copiedTable, which may
+   not be table itself. Returns 1 on success, 0 if no ball is rolling and
+   -1 if memory for the broad phase could not be allocated */
+static int phylib_segment_into(phylib_table *table, phylib_table *copiedTable)
+{
+    phylib_grid grid;
+    long step = 1; // first simulation step that has not been checked yet
+
+    // nothing to do if there are no rolling balls
+    if (phylib_rolling(table) == 0) {
+        return 0;
+    }
+
+    memcpy(copiedTable, table, sizeof(phylib_table));
 
-        // updates the copy's time and returns it
-        copiedTable->time = copiedTable->time + time;
-        return copiedTable;
+    // nothing but the rolling balls moves until the event
+    if (phylib_grid_build(&grid, table) == 0) {
+        return -1;
+    }
+
+    double lower = 0.0;
+    while (lower < PHYLIB_MAX_TIME) {
+        double next = phylib_next_event(table, &grid, lower);
+        if (next >= PHYLIB_MAX_TIME) {
+            break;
+        }
+
+        // confirms the event on the same step phylib_segment_stepped would
+        long first = (long)floor(next / PHYLIB_SIM_RATE);
+        if (first > step) {
+            step = first;
+        }
+
+        for (int i = 0; i < 2; i++, step++) {
+            double time = step * PHYLIB_SIM_RATE;
+            if (phylib_step(copiedTable, table, time, &grid) == 1) {
+                phylib_grid_free(&grid);
+                copiedTable->time = copiedTable->time + time;
+                return 1;
+            }
+        }
+
+        // the contact only grazed between two steps, look past it
+        lower = (step - 1) * PHYLIB_SIM_RATE;
+    }
+
+    phylib_grid_free(&grid);
+
+    // nothing happens before max time, so leave the balls on the last step
+    double time = (ceil(PHYLIB_MAX_TIME / PHYLIB_SIM_RATE) - 1) * PHYLIB_SIM_RATE;
+    for (int i = 0; i < PHYLIB_MAX_OBJECTS; i++) {
+        phylib_object *ball = phylib_slot(copiedTable, i);
+        if (ball != NULL && ball->type == PHYLIB_ROLLING_BALL) {
+            phylib_roll(ball, phylib_slot(table, i), time);
+        }
+    }
+
+    copiedTable->time = copiedTable->time + PHYLIB_MAX_TIME;
+    return 1;
+}
+
+/* Event-driven simulation: solves the motion in closed form for the first
+   stop or contact and jumps straight to the simulation step containing it,
+   instead of testing every PHYLIB_SIM_RATE step on the way there */
+phylib_table *phylib_segment(phylib_table *table) {
+
+    // returns null if there are no rolling balls
+    if (phylib_rolling(table) == 0) {
+        return NULL;
+    }
+
+    phylib_table *copiedTable = malloc(sizeof(phylib_table));
+    if (copiedTable == NULL) {
+        return NULL;
+    }
+
+    if (phylib_segment_into(table, copiedTable) != 1) {
+        phylib_free_table(copiedTable);
+        return NULL;
+    }
+    return copiedTable;
+}
+
+/* Runs a whole shot: segment after segment until no ball is rolling, the
+   shot has lasted PHYLIB_MAX_TIME or max_events events were produced (0 for
+   no cap). Returns the event tables, in order, in a single allocation the
+   caller frees, and their number in count. Returns NULL with count 0 if
+   nothing was rolling, or with count -1 if memory ran out */
+phylib_table *phylib_simulate_shot(phylib_table *table, int max_events, int *count)
+{
+    int capacity = 16;
+    phylib_table *events = malloc(sizeof(phylib_table) * capacity);
+
+    *count = 0;
+    if (events == NULL) {
+        *count = -1;
+        return NULL;
+    }
+
+    while (max_events <= 0 || *count < max_events) {
+        if (*count == capacity) {
+            phylib_table *grown = realloc(events, sizeof(phylib_table) * capacity * 2);
+            if (grown == NULL) {
+                free(events);
+                *count = -1;
+                return NULL;
+            }
+            events = grown;
+            capacity *= 2;
+        }
+
+        // each segment starts from the previous event (so after any realloc)
+        phylib_table *current = (*count == 0) ? table : &events[*count - 1];
+
+        // stops once the shot has run for the longest allowed time
+        if (current->time - table->time >= PHYLIB_MAX_TIME) {
+            break;
+        }
+
+        int result = phylib_segment_into(current, &events[*count]);
+        if (result == 0) {
+            break; // every ball is at rest
+        }
+        if (result < 0) {
+            free(events);
+            *count = -1;
+            return NULL;
+        }
+
+        (*count)++;
+    }
+
+    if (*count == 0) {
+        free(events);
+        return NULL;
+    }
+    return events;
 }
 
 char *phylib_object_string(phylib_object *object)
@@ -3,6 +3,7 @@
 #include <string.h>
 #include <stdbool.h>
 #include <math.h>
+#include <stdint.h>
 
 #define PHYLIB_BALL_RADIUS (28.5) // mm
 #define PHYLIB_BALL_DIAMETER (2*PHYLIB_BALL_RADIUS)
@@ -17,7 +18,31 @@
 #define PHYLIB_DRAG (150.0) // mm/s^2
 #define PHYLIB_MAX_TIME (600) // s
 
+// can be raised at build time for stress layouts, with make MAX_OBJECTS=...
+// so that swig sees the same limit as the compiler
+#ifndef PHYLIB_MAX_OBJECTS
 #define PHYLIB_MAX_OBJECTS (26)
+#endif
+
+#define PHYLIB_MASK_BITS (32) // slots tracked by each word of a table mask
+#define PHYLIB_MASK_WORDS ((PHYLIB_MAX_OBJECTS + PHYLIB_MASK_BITS - 1) / PHYLIB_MASK_BITS)
+
+#define PHYLIB_POLY_DEGREE (4) // highest degree of the contact polynomials
+
+#define PHYLIB_GRID_CELL (120.0) // mm, side of a broad phase cell
+#define PHYLIB_GRID_COLS (12) // cells across the table width
+#define PHYLIB_GRID_ROWS (23) // cells along the table length
+
+#define PHYLIB_FRAME_FIELDS (6) // number, x, y, type, xvel, yvel per ball and frame
+#define PHYLIB_SNAPSHOT_FIELDS (9) // type, number, x, y, xvel, yvel, xacc, yacc, slot per ball
+
+// packed tables (phylib_pack_table): a header of magic, version, flags,
+// object count, two spare bytes and the time, then each object as its slot,
+// type and fields
+#define PHYLIB_PACKED_VERSION (1)
+#define PHYLIB_PACKED_HEADER (16) // bytes
+#define PHYLIB_PACKED_OBJECT (3 + 1 + 6 * sizeof(double)) // most bytes an object takes
+#define PHYLIB_PACKED_MAX (PHYLIB_PACKED_HEADER + PHYLIB_MAX_OBJECTS * PHYLIB_PACKED_OBJECT)
 
 
 /* Different types of objects*/
@@ -79,12 +104,28 @@ phylib_obj type;
 phylib_untyped obj;
 } phylib_object;
 
-/* Pool table */
+/* Pool table, the objects are stored inline and bit i of mask is set when
+   slot i holds one */
 typedef struct {
 double time;
-phylib_object *object[PHYLIB_MAX_OBJECTS];
+uint32_t mask[PHYLIB_MASK_WORDS];
+phylib_object object[PHYLIB_MAX_OBJECTS];
 } phylib_table;
 
+/* Uniform grid broad phase over the table */
+typedef struct {
+int cells[PHYLIB_GRID_ROWS * PHYLIB_GRID_COLS]; // first entry of each cell, -1 if empty
+int *next; // next entry in the same cell
+int *index; // object of each entry
+int *mark; // last query that found each object
+int *moving; // rolling balls, which are not binned
+int *found; // objects found by the last query
+int *memory; // single allocation behind the arrays above
+phylib_table *table;
+int nmoving;
+int query;
+} phylib_grid;
+
 /* Function Definitions */
 
 phylib_object *phylib_new_still_ball(unsigned char number, phylib_coord *pos);
@@ -98,6 +139,8 @@ phylib_table *phylib_new_table(void);
 void phylib_copy_object(phylib_object **dest, phylib_object **src );
 phylib_table *phylib_copy_table(phylib_table *table);
 void phylib_add_object(phylib_table *table, phylib_object *object);
+phylib_object *phylib_get_object(phylib_table *table, int i);
+void phylib_remove_object(phylib_table *table, int i);
 void phylib_free_table(phylib_table *table);
 phylib_coord phylib_sub(phylib_coord c1, phylib_coord c2);
 double phylib_length(phylib_coord c);
@@ -107,7 +150,18 @@ double phylib_distance(phylib_object *obj1, phylib_object *obj2);
 void phylib_roll(phylib_object *new, phylib_object *old, double time);
 unsigned char phylib_stopped( phylib_object *object);
 void phylib_bounce( phylib_object **a, phylib_object **b);
-unsigned char phylib_rolling(phylib_table *t);
+int phylib_rolling(phylib_table *t);
+int phylib_count_balls(phylib_table *table);
+int phylib_roll_frames(phylib_table *table, const double *times, int ntimes, double *frames);
+int phylib_snapshot(phylib_table *table, double *rows);
+int phylib_add_balls(phylib_table *table, const double *rows, int nballs);
+size_t phylib_pack_table(phylib_table *table, unsigned char flags, unsigned char *out);
+int phylib_unpack_table(phylib_table *table, const unsigned char *data, size_t size, unsigned char *flags);
 phylib_table *phylib_segment(phylib_table *table);
+phylib_table *phylib_segment_stepped(phylib_table *table);
+phylib_table *phylib_simulate_shot(phylib_table *table, int max_events, int *count);
+int phylib_grid_build(phylib_grid *grid, phylib_table *table);
+int phylib_grid_query(phylib_grid *grid, double x0, double y0, double x1, double y1);
+void phylib_grid_free(phylib_grid *grid);
 char *phylib_object_string(phylib_object *object);
 
@@ -14,8 +14,22 @@
 
 /******************************************************************************/
 
+%include "stdint.i"
+
+/* a limit given on the command line (make MAX_OBJECTS=...) skips the define
+   in phylib.h, so it is made the constant here instead                     */
+#ifdef PHYLIB_MAX_OBJECTS
+%rename("PHYLIB_MAX_OBJECTS") phylib_max_objects;
+%constant int phylib_max_objects = PHYLIB_MAX_OBJECTS;
+#endif
+
 %include "phylib.h"
 
+/* tables these return are new, so Python owns and frees them */
+%newobject phylib_table::copy;
+%newobject phylib_table::segment;
+%newobject phylib_table::segment_stepped;
+
 /******************************************************************************/
 /* this creates a phylib_coord class in the phylib python module              */
 /******************************************************************************/
@@ -137,19 +151,330 @@
 
   /****************************************************************************/
 
-  phylib_object *get_object( unsigned char i )
+  /* runs the whole shot in one call and returns the list of event tables,
+     at most max_events of them unless max_events is 0                       */
+  PyObject *simulate( int max_events = 0 )
   {
-    return $self->object[i];
+    PyObject *list;
+    int count;
+    phylib_table *events = phylib_simulate_shot( $self, max_events, &count );
+
+    if (count < 0)
+    {
+      return PyErr_NoMemory();
+    }
+
+    list = PyList_New( count );
+    if (!list)
+    {
+      free( events );
+      return NULL;
+    }
+
+    /* every event gets its own table so Python can free them one by one */
+    for (int i = 0; i < count; i++)
+    {
+      phylib_table *event = phylib_copy_table( &events[i] );
+      if (!event)
+      {
+        free( events );
+        Py_DECREF( list );
+        return PyErr_NoMemory();
+      }
+      PyList_SET_ITEM( list, i, SWIG_NewPointerObj( SWIG_as_voidptr( event ),
+                                  SWIGTYPE_p_phylib_table, SWIG_POINTER_OWN ) );
+    }
+
+    free( events );
+    return list;
   }
 
   /****************************************************************************/
 
-  void add_object( phylib_object *object1 )
+  phylib_table *segment_stepped()
+  {
+    return phylib_segment_stepped( $self );
+  }
+
+  /****************************************************************************/
+
+  /* rolls the table to every time in a sequence in one call; the frames come
+     back as a memoryview of doubles shaped (frames, balls, FRAME_FIELDS),
+     or an empty one when there are no frames or no balls                    */
+  PyObject *roll_frames( PyObject *times )
+  {
+    PyObject *seq, *buffer, *view, *frames;
+    Py_ssize_t ntimes;
+    double *values;
+    int nballs;
+
+    seq = PySequence_Fast( times, "times must be a sequence" );
+    if (!seq)
+    {
+      return NULL;
+    }
+
+    ntimes = PySequence_Fast_GET_SIZE( seq );
+    values = malloc( sizeof( double ) * (ntimes + 1) );
+    if (!values)
+    {
+      Py_DECREF( seq );
+      return PyErr_NoMemory();
+    }
+
+    for (Py_ssize_t i = 0; i < ntimes; i++)
+    {
+      values[i] = PyFloat_AsDouble( PySequence_Fast_GET_ITEM( seq, i ) );
+    }
+    Py_DECREF( seq );
+    if (PyErr_Occurred())
+    {
+      free( values );
+      return NULL;
+    }
+
+    nballs = phylib_count_balls( $self );
+    buffer = PyByteArray_FromStringAndSize( NULL,
+                 sizeof( double ) * ntimes * nballs * PHYLIB_FRAME_FIELDS );
+    if (!buffer)
+    {
+      free( values );
+      return NULL;
+    }
+
+    phylib_roll_frames( $self, values, (int)ntimes,
+                        (double *)PyByteArray_AS_STRING( buffer ) );
+    free( values );
+
+    view = PyMemoryView_FromObject( buffer );
+    Py_DECREF( buffer );
+    if (!view)
+    {
+      return NULL;
+    }
+
+    /* memoryview can not take a shape with a zero in it */
+    if (ntimes == 0 || nballs == 0)
+    {
+      frames = PyObject_CallMethod( view, "cast", "s", "d" );
+    }
+    else
+    {
+      frames = PyObject_CallMethod( view, "cast", "s(nii)", "d",
+                                    ntimes, nballs, PHYLIB_FRAME_FIELDS );
+    }
+    Py_DECREF( view );
+    return frames;
+  }
+
+  /****************************************************************************/
+
+  /* every ball's type, number, x, y, xvel, yvel, xacc, yacc and slot in one
+     call, as a memoryview of doubles shaped (balls, SNAPSHOT_FIELDS); with
+     out, a writable buffer big enough, the rows are written into it and a
+     view of the part used is returned, so nothing new is allocated for them */
+  PyObject *snapshot( PyObject *out = NULL )
   {
-    phylib_object *ptr;
+    PyObject *buffer, *view, *rows;
+    Py_buffer target;
+    int nballs = phylib_count_balls( $self );
+    Py_ssize_t size = sizeof( double ) * nballs * PHYLIB_SNAPSHOT_FIELDS;
+
+    if (out && out != Py_None)
+    {
+      if (PyObject_GetBuffer( out, &target, PyBUF_WRITABLE | PyBUF_C_CONTIGUOUS ) < 0)
+      {
+        return NULL;
+      }
+      if (target.len < size)
+      {
+        PyBuffer_Release( &target );
+        PyErr_SetString( PyExc_ValueError, "snapshot buffer is too small" );
+        return NULL;
+      }
+      phylib_snapshot( $self, (double *)target.buf );
+      PyBuffer_Release( &target );
+      Py_INCREF( out );
+      buffer = out;
+    }
+    else
+    {
+      buffer = PyByteArray_FromStringAndSize( NULL, size );
+      if (!buffer)
+      {
+        return NULL;
+      }
+      phylib_snapshot( $self, (double *)PyByteArray_AS_STRING( buffer ) );
+    }
+
+    view = PyMemoryView_FromObject( buffer );
+    Py_DECREF( buffer );
+    if (!view)
+    {
+      return NULL;
+    }
 
-    phylib_copy_object( &ptr, &object1 );
-    phylib_add_object( self, ptr );
+    /* only the rows written, cast to doubles; memoryview can not take a
+       shape with a zero in it */
+    rows = PyObject_CallMethod( view, "cast", "s", "B" );
+    Py_DECREF( view );
+    if (!rows)
+    {
+      return NULL;
+    }
+    view = PySequence_GetSlice( rows, 0, size );
+    Py_DECREF( rows );
+    if (!view)
+    {
+      return NULL;
+    }
+    if (nballs == 0)
+    {
+      rows = PyObject_CallMethod( view, "cast", "s", "d" );
+    }
+    else
+    {
+      rows = PyObject_CallMethod( view, "cast", "s(ii)", "d",
+                                  nballs, PHYLIB_SNAPSHOT_FIELDS );
+    }
+    Py_DECREF( view );
+    return rows;
+  }
+
+  /****************************************************************************/
+
+  /* adds balls from rows of FRAME_FIELDS values (number, x, y, type, xvel,
+     yvel), given as a C-contiguous buffer of doubles such as roll_frames
+     makes, or as a sequence of rows; returns how many were added          */
+  PyObject *add_balls( PyObject *rows )
+  {
+    Py_buffer view;
+    PyObject *seq;
+    double *values;
+    Py_ssize_t nballs;
+    int added;
+
+    if (PyObject_GetBuffer( rows, &view, PyBUF_FORMAT | PyBUF_C_CONTIGUOUS ) == 0)
+    {
+      const char *format = view.format ? view.format : "B";
+      if (format[0] == '@' || format[0] == '=' || format[0] == '<')
+      {
+        format++;
+      }
+      if (strcmp( format, "d" ) != 0 ||
+          view.len % (sizeof( double ) * PHYLIB_FRAME_FIELDS) != 0)
+      {
+        PyBuffer_Release( &view );
+        PyErr_SetString( PyExc_ValueError,
+                         "ball rows must be doubles, FRAME_FIELDS to a row" );
+        return NULL;
+      }
+      added = phylib_add_balls( $self, (const double *)view.buf,
+                   (int)(view.len / (sizeof( double ) * PHYLIB_FRAME_FIELDS)) );
+      PyBuffer_Release( &view );
+      return PyLong_FromLong( added );
+    }
+    PyErr_Clear();
+
+    seq = PySequence_Fast( rows, "ball rows must be a buffer or a sequence" );
+    if (!seq)
+    {
+      return NULL;
+    }
+    nballs = PySequence_Fast_GET_SIZE( seq );
+    values = malloc( sizeof( double ) * PHYLIB_FRAME_FIELDS * (nballs + 1) );
+    if (!values)
+    {
+      Py_DECREF( seq );
+      return PyErr_NoMemory();
+    }
+
+    for (Py_ssize_t i = 0; i < nballs; i++)
+    {
+      PyObject *row = PySequence_Fast( PySequence_Fast_GET_ITEM( seq, i ),
+                                       "each ball row must be a sequence" );
+      if (!row)
+      {
+        break;
+      }
+      if (PySequence_Fast_GET_SIZE( row ) != PHYLIB_FRAME_FIELDS)
+      {
+        PyErr_SetString( PyExc_ValueError, "each ball row must have FRAME_FIELDS values" );
+        Py_DECREF( row );
+        break;
+      }
+      for (int j = 0; j < PHYLIB_FRAME_FIELDS; j++)
+      {
+        values[i * PHYLIB_FRAME_FIELDS + j] =
+          PyFloat_AsDouble( PySequence_Fast_GET_ITEM( row, j ) );
+      }
+      Py_DECREF( row );
+      if (PyErr_Occurred())
+      {
+        break;
+      }
+    }
+    Py_DECREF( seq );
+    if (PyErr_Occurred())
+    {
+      free( values );
+      return NULL;
+    }
+
+    added = phylib_add_balls( $self, values, (int)nballs );
+    free( values );
+    return PyLong_FromLong( added );
+  }
+
+  /****************************************************************************/
+
+  /* the table packed by phylib_pack_table as bytes, with flags, a byte the
+     caller keeps for itself, in the header                                 */
+  PyObject *pack( unsigned char flags = 0 )
+  {
+    unsigned char out[PHYLIB_PACKED_MAX];
+    size_t size = phylib_pack_table( $self, flags, out );
+    return PyBytes_FromStringAndSize( (const char *)out, (Py_ssize_t)size );
+  }
+
+  /****************************************************************************/
+
+  /* replaces everything on the table with a table pack made, given as any
+     bytes-like object, and returns the flags it was packed with            */
+  PyObject *unpack( PyObject *data )
+  {
+    Py_buffer view;
+    unsigned char flags = 0;
+    int result;
+
+    if (PyObject_GetBuffer( data, &view, PyBUF_C_CONTIGUOUS ) < 0)
+    {
+      return NULL;
+    }
+    result = phylib_unpack_table( $self, (const unsigned char *)view.buf,
+                                  (size_t)view.len, &flags );
+    PyBuffer_Release( &view );
+    if (result < 0)
+    {
+      PyErr_SetString( PyExc_ValueError, "not a packed table" );
+      return NULL;
+    }
+    return PyLong_FromLong( flags );
+  }
+
+  /****************************************************************************/
+
+  phylib_object *get_object( int i )
+  {
+    return phylib_get_object( $self, i );
+  }
+
+  /****************************************************************************/
+
+  void add_object( phylib_object *object1 )
+  {
+    /* the table stores its own copy of the object */
+    phylib_add_object( $self, object1 );
   }
 
   /****************************************************************************/
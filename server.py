@@ -5,9 +5,19 @@ import math;
 import Physics;
 import mimetypes;
 import json;
+import secrets;
+import threading;
+import queue;
+import multiprocessing;
+import hashlib;
+import gzip;
+import zlib;
+import collections;
 
 # web server parts
-from http.server import HTTPServer, BaseHTTPRequestHandler;
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler;
+from http.cookies import SimpleCookie;
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor;
 
 # imports classes from Physics Module
 from Physics import *
@@ -15,82 +25,371 @@ from Physics import *
 # used to parse the URL and extract form data for GET requests
 from urllib.parse import urlparse, parse_qsl;
 
-instance_table = Physics.Table() # creates an instance of table
-svg_creation = instance_table.setup_pool_table() # sets up the pool table
+# how many shots are simulated at once, and the cookie that names a game
+SHOT_WORKERS = 4
+SESSION_COOKIE = "pool_game"
+MAX_SESSIONS = 256 # the oldest games are forgotten past this
+STREAM_QUEUE = 64 # frames waiting between a streaming shot and its response
+SHOT_CACHE_BYTES = Physics.SHOT_CACHE_BYTES # results of repeated shots kept for every game
+PLAN_WORKERS = Physics.SHOT_WORKERS # processes that search shots for /assist
+MAX_PLAN_BUDGET = 5.0 # longest an /assist search may take, in seconds
+SHOT_SAMPLING = Physics.FRAME_SAMPLING # which frames of each shot are made, see Physics.FrameSampling
+SVG_PLACEHOLDER = b'<!-- SVG_CONTENT -->' # where pages have the table drawn in
+STATIC_FILES = ("display.html", "form.html", "cueshot.js", "style.css") # the only files served as they are
+STATIC_MAX_BYTES = 1024 * 1024 # larger files are not served or kept
+KEEPALIVE_TIMEOUT = 30 # seconds an idle connection is kept open
+COMPRESS_MIN = 1024 # bodies smaller than this go out as they are
+COMPRESS_LEVEL = 6
+COMPRESSED_CACHE_BYTES = 16 * 1024 * 1024 # compressed bodies kept by ETag, 0 for none
+COMPRESSIBLE = ("text/", "image/svg+xml", "application/javascript", "application/json", "application/x-ndjson")
+SERVE_METRICS = True # answer GET /metrics; shots are only timed with Physics.SHOT_METRICS
+
+# the state of one game played against the server
+class GameSession:
+    def __init__(self, player1_name='', player2_name='', game_name='', cache=None):
+        self.player1_name = player1_name
+        self.player2_name = player2_name
+        self.game_name = game_name
+        self.current_player = ''
+        self.ball_set = ''
+        self.game_id = None # set once the first shot creates the game in the database
+        self.table = Physics.Table().setup_pool_table() # sets up the pool table
+        self.table_version = 0 # counts the tables this game has had, for ETags
+        self.tag = secrets.token_hex(4) # tells this game's ETags from other games'
+        self.svg = None # (table, svg) of the table last drawn
+        self.animation = '' # the animate.html of the last shot
+        self.lock = threading.Lock() # one shot at a time for each game
+        self.cache = cache # the server's cache of shot results
 
-# define global variable for players names and game name 
-player1_name = ''
-player2_name = ''
-game_name = ''
-current_player = ''
-
-# here we have an HTTP server that includes a connection to the database
-class EnhancedHTTPServer(HTTPServer):
+    # assigns players low and high
+    def set_player_and_ball(self):
+        if self.current_player is None or self.current_player == self.player2_name:
+            self.current_player = self.player1_name
+            self.ball_set = "low"
+        else:
+            self.current_player = self.player2_name
+            self.ball_set = "high"
+
+    # returns the game in the database, creating it on the first shot
+    def open_game(self):
+        if self.game_id is None:
+            game = Physics.Game(gameName=self.game_name, player1Name=self.player1_name, player2Name=self.player2_name,
+                                cache=self.cache, sampling=SHOT_SAMPLING)
+            self.game_id = game.gameID
+            return game
+        return Physics.Game(gameID=self.game_id, cache=self.cache, sampling=SHOT_SAMPLING)
+
+    # plays a shot on this game's table and returns the svg of every frame
+    def shoot(self, velocity_x, velocity_y):
+        with self.lock:
+            self.set_player_and_ball()
+            game = self.open_game()
+            try:
+                svg_tables, table = game.shoot(self.game_name, self.player1_name, self.table, velocity_x, velocity_y)
+            finally:
+                game.close()
+
+            self.set_table(table)
+            return svg_tables
+
+    # moves on to the table a shot ended with
+    def set_table(self, table):
+        self.table = table
+        self.table_version += 1
+
+    # the svg of this game's table, drawn again only when the table changes
+    def table_svg(self):
+        table, drawn = self.svg or (None, None)
+        if table is not self.table:
+            table = self.table
+            drawn = table.svg()
+            self.svg = (table, drawn)
+        return drawn
+
+    # searches for shots that pot the target ball from this game's table
+    def assist(self, target, pocket, budget, executor):
+        with self.lock:
+            table = self.table.copy() # a shot in play changes the table
+        return Physics.plan_shot(table, target, pocket, budget, executor=executor)
+
+    # plays a shot on this game's table, passing each frame to emit as it is made
+    def shoot_stream(self, velocity_x, velocity_y, emit, output="svg"):
+        with self.lock:
+            self.set_player_and_ball()
+            game = self.open_game()
+            try:
+                frames = game.shoot_frames(self.game_name, self.player1_name, self.table, velocity_x, velocity_y, output)
+                while True:
+                    try:
+                        emit(next(frames))
+                    except StopIteration as done:
+                        self.set_table(done.value)
+                        break
+            finally:
+                game.close()
+
+# the JSON object of a request body; raises ValueError if it is not one
+def request_object(body):
+    try:
+        data = json.loads(body.decode('utf-8'))
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        raise ValueError("The request is not JSON")
+    if not isinstance(data, dict):
+        raise ValueError("The request must be a JSON object")
+    return data
+
+# the cue velocity and output of a /send or /stream request body; raises
+# ValueError unless both velocities are finite numbers and the output is
+# one of Physics.SHOT_OUTPUTS
+def shot_request(body):
+    data = request_object(body)
+    velocity = []
+    for name in ('velocity_x', 'velocity_y'):
+        value = data.get(name)
+        if not isinstance(value, (int, float)) or isinstance(value, bool) or not math.isfinite(value):
+            raise ValueError(f"{name} must be a number")
+        velocity.append(float(value))
+    output = data.get('output', 'svg')
+    if output not in Physics.SHOT_OUTPUTS:
+        raise ValueError(f"Unknown output {output}")
+    return velocity[0], velocity[1], output
+
+# the target ball, pocket and budget of an /assist request body; raises
+# ValueError for anything that is not JSON with a whole ball number, a whole
+# pocket number or null, and a positive budget
+def assist_request(body):
+    data = request_object(body)
+
+    # bool is an int to Python, but not a ball or a pocket
+    target = data.get('target')
+    if not isinstance(target, int) or isinstance(target, bool):
+        raise ValueError("target must be a ball number")
+    pocket = data.get('pocket')
+    if pocket is not None and (not isinstance(pocket, int) or isinstance(pocket, bool)):
+        raise ValueError("pocket must be a pocket number or null")
+    budget = data.get('budget', Physics.PLAN_BUDGET)
+    if not isinstance(budget, (int, float)) or isinstance(budget, bool) or not 0 < budget < float('inf'):
+        raise ValueError("budget must be a positive number of seconds")
+    return target, pocket, min(float(budget), MAX_PLAN_BUDGET)
+
+# the files of the pages served from the current directory, kept in memory
+# and read again only when their modification time or size changes
+class StaticFiles:
+    def __init__(self, root='.', names=STATIC_FILES, max_bytes=STATIC_MAX_BYTES):
+        self.root = os.path.abspath(root)
+        self.names = frozenset(names)
+        self.max_bytes = max_bytes
+        self.files = {}
+        self.lock = threading.Lock()
+
+    # returns (content, etag, content type, has the svg placeholder) for a
+    # url path, or None if it is not one of the names or there is no such file
+    def get(self, path):
+        name = path.lstrip('/')
+        if name not in self.names:
+            return None
+        filepath = os.path.join(self.root, name)
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+        if stat.st_size > self.max_bytes:
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+
+        with self.lock:
+            entry = self.files.get(filepath)
+        if entry is None or entry[0] != stamp:
+            with open(filepath, 'rb') as file:
+                content = file.read()
+            mimetype, _ = mimetypes.guess_type(filepath)
+            etag = hashlib.blake2b(content, digest_size=8).hexdigest()
+            entry = (stamp, content, etag, mimetype or 'application/octet-stream', SVG_PLACEHOLDER in content)
+            with self.lock:
+                self.files[filepath] = entry
+        return entry[1:]
+
+# compressed bodies of responses with an ETag, so the same page or table is
+# only compressed once; the least recently used are forgotten past budget bytes
+class CompressedCache:
+    def __init__(self, budget=COMPRESSED_CACHE_BYTES):
+        self.budget = budget
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    # returns content compressed with encoding, compressing it if it is not kept
+    def get(self, etag, encoding, content):
+        key = (etag, encoding)
+        with self.lock:
+            body = self.entries.get(key)
+            if body is not None:
+                self.entries.move_to_end(key)
+                return body
+        body = compress(content, encoding)
+        if len(body) <= self.budget:
+            with self.lock:
+                if key not in self.entries:
+                    self.entries[key] = body
+                    self.size += len(body)
+                while self.size > self.budget:
+                    self.size -= len(self.entries.popitem(last=False)[1])
+        return body
+
+# compresses a body for a Content-Encoding of gzip or deflate
+def compress(content, encoding):
+    if encoding == "gzip":
+        return gzip.compress(content, compresslevel=COMPRESS_LEVEL, mtime=0)
+    return zlib.compress(content, COMPRESS_LEVEL)
+
+# the encoding to send to a client from its Accept-Encoding, or None
+def choose_encoding(accept):
+    allowed = {}
+    for part in accept.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        allowed[name.strip().lower()] = quality
+    for encoding in ("gzip", "deflate"):
+        if allowed.get(encoding, allowed.get('*', 0.0)) > 0.0:
+            return encoding
+    return None
+
+# here we have a threaded HTTP server that keeps every game's state and
+# simulates shots in a pool of worker threads
+class EnhancedHTTPServer(ThreadingHTTPServer):
     # initializes the server with an address, request handler class, and database connection
-    def __init__(self, server_address, RequestHandlerClass, db):
+    def __init__(self, server_address, RequestHandlerClass, db=None, workers=SHOT_WORKERS):
+        self.sessions = collections.OrderedDict() # least recently used first
+        self.sessions_lock = threading.Lock()
+        self.blank_session = GameSession() # what clients without a game are shown; never played
+        self.shots = ThreadPoolExecutor(max_workers=workers)
+        self.shot_cache = Physics.ShotCache(SHOT_CACHE_BYTES) # shared by every game
+        self.static = StaticFiles()
+        self.compressed = CompressedCache()
+        # started processes keep their outcomes between searches; spawned, as this process has threads
+        self.planner = ProcessPoolExecutor(max_workers=PLAN_WORKERS, mp_context=multiprocessing.get_context("spawn"))
         super().__init__(server_address, RequestHandlerClass)  # initializes the parent class
         self.db = db  # here we store the database connection in the server instance
 
+    # returns the session with the id, or None, marking it as the most recently used
+    def get_session(self, session_id):
+        with self.sessions_lock:
+            session = self.sessions.get(session_id)
+            if session is not None:
+                self.sessions.move_to_end(session_id)
+            return session
+
+    # starts a new session and returns its id, forgetting the least recently used past MAX_SESSIONS
+    def new_session(self, session):
+        session_id = secrets.token_hex(16)
+        with self.sessions_lock:
+            self.sessions[session_id] = session
+            while len(self.sessions) > MAX_SESSIONS:
+                self.sessions.popitem(last=False)
+        return session_id
+
+    def server_close(self):
+        super().server_close()
+        self.shots.shutdown()
+        self.planner.shutdown(cancel_futures=True)
+
 class MyHandler(BaseHTTPRequestHandler):
 
+    # connections stay open between requests, so every response says how long it is
+    protocol_version = "HTTP/1.1"
+    timeout = KEEPALIVE_TIMEOUT
+
+    # returns this client's game; if it has none, a new one is started for
+    # it, or with create False the server's blank game is returned, which
+    # is not kept for the client
+    def session(self, create=True):
+        cookie = SimpleCookie(self.headers.get('Cookie', ''))
+        if SESSION_COOKIE in cookie:
+            session = self.server.get_session(cookie[SESSION_COOKIE].value)
+            if session is not None:
+                return session
+        if not create:
+            return self.server.blank_session
+        return self.start_session(GameSession())
+
+    # keeps a new session for the client and sends its cookie with the response
+    def start_session(self, session):
+        session.cache = self.server.shot_cache
+        self.new_session_id = self.server.new_session(session)
+        return session
+
+    def end_headers(self):
+        session_id = getattr(self, 'new_session_id', None)
+        if session_id is not None:
+            self.send_header('Set-Cookie', f'{SESSION_COOKIE}={session_id}; Path=/; HttpOnly; SameSite=Lax')
+            self.new_session_id = None
+        super().end_headers()
+
     def do_GET(self):
 
         parsed = urlparse(self.path)
 
-        if parsed.path.startswith('/'):
-            filepath = '.' + self.path  # Assuming files are served from the current directory
-            if os.path.isfile(filepath):
-                # here we determine the file's MIME type and serve it
-                mimetype, _ = mimetypes.guess_type(filepath)
-                try:
-                    with open(filepath, 'rb') as file:
-                        content = file.read().decode('utf-8')
-                    
-                    svg_content = svg_creation.svg()
-                    # Replace the placeholder for SVG content with the actual SVG string
-                    content = content.replace('<!-- SVG_CONTENT -->', svg_content)
-
-                    # here we add the current player's name to the content
-                    if current_player is player1_name:
-                        current = player2_name
-                    elif current_player == player2_name:
-                        current = player1_name
-                    else:
-                        current = player1_name
-
-                    content += f"currentPlayerName = '{current}'"
-
-                    self.send_response(200)
-                    self.send_header('Content-type', mimetype or 'application/octet-stream')
-                    self.end_headers()
-                    self.wfile.write(content.encode('utf-8'))
-                except FileNotFoundError:
-                    self.send_error(404, 'File Not Found: %s' % self.path)
-                
-        elif parsed.path.endswith(".js"):
-            try:
-                with open('.' + self.path, 'rb') as file:
-                    content = file.read()
-                self.send_response(200)
-                self.send_header("Content-type", "application/javascript")
-                self.send_header("Content-length", len(content))
-                self.end_headers()
-                self.wfile.write(content)
-            except FileNotFoundError:
-                self.send_error(404, 'File Not Found: %s' % self.path)
+        # the server's counters are not part of any game
+        if parsed.path == '/metrics' and SERVE_METRICS:
+            self.serve_metrics()
+            return
+
+        # only playing a shot or starting a game makes a new game for a client
+        session = self.session(create=False)
+        static = self.server.static.get(parsed.path) if parsed.path.startswith('/') else None
+
+        # the last shot of this game is kept in its session
+        if parsed.path == '/animate.html' and session.animation:
+            version = '"animate-%s-%d"' % (session.tag, session.table_version)
+            if not self.not_modified(version):
+                self.serve_content(session.animation, etag=version)
+
+        # the table on its own, for pages that poll it
+        elif parsed.path == '/table.svg':
+            version = '"table-%s-%d"' % (session.tag, session.table_version)
+            if not self.not_modified(version):
+                self.serve_content(session.table_svg(), content_type="image/svg+xml", etag=version)
+
+        elif static is not None:
+            content, etag, mimetype, placeholder = static
+
+            # here we add the current player's name to the content
+            if session.current_player is session.player1_name:
+                current = session.player2_name
+            elif session.current_player == session.player2_name:
+                current = session.player1_name
+            else:
+                current = session.player1_name
+
+            # the page changes with the file, the player and the table if it is drawn in
+            tag = "%s-%s-%s" % (etag, hashlib.blake2b(current.encode('utf-8'), digest_size=4).hexdigest(),
+                                "%s.%d" % (session.tag, session.table_version) if placeholder else "")
+            if self.not_modified('"%s"' % tag):
+                return
+
+            # Replace the placeholder for SVG content with the actual SVG string
+            if placeholder:
+                content = content.replace(SVG_PLACEHOLDER, session.table_svg().encode('utf-8'))
+            content += f"currentPlayerName = '{current}'".encode('utf-8')
+
+            self.send_body(content, mimetype, etag='"%s"' % tag)
 
         elif parsed.path.startswith('/table-') and parsed.path.endswith('.svg'):
             # Serve SVG files
             table_file = parsed.path[1:]
             #print(table_file)
-            if os.path.exists(table_file):
+            if '/' not in table_file and os.path.isfile(table_file):
                 with open(table_file, 'rb') as file:
                     content = file.read()
                     #print("CONTENT: ", str(content))
-                self.send_response(200)
-                self.send_header('Content-type', 'image/svg+xml')
-                self.end_headers()
-                self.wfile.write(content);
+                self.send_body(content, 'image/svg+xml')
                 
             else:
                 self.send_error(404, 'File Not Found: %s' % self.path)
@@ -98,16 +397,11 @@ class MyHandler(BaseHTTPRequestHandler):
 
         else:
             # generate 404 for GET requests that aren't the 3 files above
-            self.send_response( 404 );
-            self.end_headers();
-            self.wfile.write( bytes( "404: %s not found" % self.path, "utf-8" ) );
+            self.send_body( bytes( "404: %s not found" % self.path, "utf-8" ), "text/plain", status_code=404 );
 
 
     def do_POST(self):
         
-        # define global variables to hold player names and the game name
-        global player1_name, player2_name, game_name, svg_creation, html_content
-
         # parse the URL to get data
         parsed_url = urlparse(self.path)
 
@@ -115,35 +409,25 @@ class MyHandler(BaseHTTPRequestHandler):
         if parsed_url.path == '/send':
             print("Processing /send request")
 
-            # we retirve player names and game name from global variables
-            player1Name = player1_name
-            player2Name = player2_name
-            gameName = game_name
-
-            self.set_player_and_ball(player1Name, player2Name)
-            
-            # read POST data and convert it from JSON to Python dictionary
+            # read POST data and extract the velocity from it
             content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length).decode('utf-8')
-            parsed_data = json.loads(post_data)
+            try:
+                velocity_x, velocity_y, output = shot_request(self.rfile.read(content_length))
+            except ValueError as error:
+                self.send_error(400, str(error))
+                return
 
-            # extract velocity data from parsed POST data
-            velocity_x = parsed_data['velocity_x']
-            velocity_y = parsed_data['velocity_y']
+            # the player names, game name and table come from this client's game
+            session = self.session()
             print(f"Received velocity data: x = {velocity_x}, y = {velocity_y}")
 
             # initialize HTML content with game's layout
             html_content = "<html><head><title>Pool Game</title><link rel='stylesheet' href='style.css'>"
             html_content += "<script src='https://ajax.googleapis.com/ajax/libs/jquery/3.5.1/jquery.min.js'></script><script src='cueshot.js'></script></head><body>"
 
-            # create game instance with retrieved player names and game name
-            game = Physics.Game(gameName=gameName, player1Name=player1Name, player2Name=player2Name)
-            
-            # call the shoot function with velocity data and update the SVG representation
-            svg_tables, table = game.shoot(gameName, player1Name, svg_creation, velocity_x, velocity_y)
+            # simulate the shot in the worker pool; the game's table is updated by the session
+            svg_tables = self.server.shots.submit(session.shoot, velocity_x, velocity_y).result()
 
-            # update global SVG creation content
-            svg_creation = table
             html_content += """<div id="svgContainer" style="position: relative;">"""
 
             # concatenate and embed SVG data into the HTML content
@@ -152,9 +436,36 @@ class MyHandler(BaseHTTPRequestHandler):
             html_content += "</div></body></html>"
 
             # finalize HTML content and navigate to the animation page
-            self.handle_animation_request()
+            self.handle_animation_request(session, html_content)
             print("HTML content written and navigation initiated")
 
+        # handling '/stream' path for playing a shot and streaming its frames as they are made
+        elif parsed_url.path == '/stream':
+            print("Processing /stream request")
+
+            # checked before the shot is played or the response started
+            content_length = int(self.headers['Content-Length'])
+            try:
+                velocity_x, velocity_y, output = shot_request(self.rfile.read(content_length))
+            except ValueError as error:
+                self.send_error(400, str(error))
+                return
+            self.stream_shot(self.session(), velocity_x, velocity_y, output)
+
+        # handling '/assist' path for searching shots that pot a ball
+        elif parsed_url.path == '/assist':
+            print("Processing /assist request")
+
+            content_length = int(self.headers['Content-Length'])
+            try:
+                target, pocket, budget = assist_request(self.rfile.read(content_length))
+                shots = self.session(create=False).assist(target, pocket, budget, self.server.planner)
+            except ValueError as error:
+                self.send_error(400, str(error))
+                return
+
+            self.serve_content(json.dumps({"shots": shots}), content_type="application/json")
+
         # handles '/formresponse' path for setting game setup data
         elif parsed_url.path == '/formresponse':
             print("Processing /formresponse request")
@@ -164,20 +475,17 @@ class MyHandler(BaseHTTPRequestHandler):
             post_data = self.rfile.read(content_length).decode('utf-8')
             parsed_data = json.loads(post_data)
 
-            # extract and store player names and game name from POST data
-            player1_name = parsed_data.get('player1_name', '')
-            player2_name = parsed_data.get('player2_name', '')
-            game_name = parsed_data.get('game_name', '')
+            # extract player names and game name from POST data and start a new game with them
+            session = self.start_session(GameSession(parsed_data.get('player1_name', ''),
+                                                     parsed_data.get('player2_name', ''),
+                                                     parsed_data.get('game_name', '')))
 
-            print(f"Player 1 Name: {player1_name}")
-            print(f"Player 2 Name: {player2_name}")
-            print(f"Game Name: {game_name}")
+            print(f"Player 1 Name: {session.player1_name}")
+            print(f"Player 2 Name: {session.player2_name}")
+            print(f"Game Name: {session.game_name}")
 
             # respond with success message
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({"message": "Success"}).encode('utf-8'))
+            self.serve_content(json.dumps({"message": "Success"}), content_type="application/json")
 
         else:
             # handle unknown POST requests with a 404 error
@@ -185,37 +493,23 @@ class MyHandler(BaseHTTPRequestHandler):
             print(f"Request for {self.path} could not be processed")
 
 
-    def handle_animation_request(self):
+    def handle_animation_request(self, session, html_content):
 
-        global html_content
-
-        # write the HTML content to the animate.html file
-        file_path = 'animate.html'
-        with open(file_path, 'w') as file:
-            file.write(html_content)
-        print(f"Content written to {file_path}")
+        # keep the HTML content as this game's animate.html
+        session.animation = html_content
+        print("Content kept as animate.html")
 
         # respond to the client, indicating where to find the animation
-        self.send_response(200)
-        self.send_header('Content-type', 'text/html')
-        self.send_header('Location', '/animate.html')
-        self.end_headers()
-        self.wfile.write(f'<html><head><meta http-equiv="Refresh" content="0; url=/animate.html"></head></html>'.encode('utf-8'))
+        self.send_body(f'<html><head><meta http-equiv="Refresh" content="0; url=/animate.html"></head></html>'.encode('utf-8'),
+                       'text/html', headers={'Location': '/animate.html'})
 
 
     def generate_and_serve_svg_string(self):
-        svg_string = ""
-        table_id = 0
         db = Physics.Database() # initalize connection to database
 
         try:
-            # here we loop through all tables in the database and append their SVG rep
-            while True:
-                table = db.readTable(table_id)
-                if not table:
-                    break  # exit the loop if no more tables are found
-                svg_string += table.svg()
-                table_id += 1
+            # here we read all tables in the database in one query and join their SVG reps
+            svg_string = "".join(table.svg() for table in db.readTables())
         finally:
             db.close()  # ensure the database is closed even if an error occurs
 
@@ -226,28 +520,148 @@ class MyHandler(BaseHTTPRequestHandler):
             # no SVG content found; send a 404 response
             self.send_error_response(404, "SVG content not found")
 
+    def stream_shot(self, session, velocity_x, velocity_y, output="svg"):
+        """
+        Plays a shot in the worker pool and sends each frame to the client as
+        a line of JSON in a chunked response while the shot is still being
+        played. At most STREAM_QUEUE frames wait between the two, and if the
+        client goes away the shot is finished without sending the rest.
+
+        With output "svg" each frame is a whole svg document. With output
+        "data" the table without balls is sent once first, with the ball
+        radius and colours, and each frame is just the balls' numbers and
+        positions as a flat [number, x, y, ...] list.
+        """
+        frames = queue.Queue(maxsize=STREAM_QUEUE)
+        cancelled = threading.Event()
+
+        # called in the worker for each frame; None marks the end of the shot
+        def emit(svg):
+            while not cancelled.is_set():
+                try:
+                    frames.put(svg, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+
+        def play():
+            try:
+                session.shoot_stream(velocity_x, velocity_y, emit, output)
+            finally:
+                emit(None)
+
+        shot = self.server.shots.submit(play)
+
+        # the frames go out as they come, so the response is chunked
+        self.send_response(200)
+        self.send_header("Content-type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        try:
+            if output == "data":
+                self.write_chunk(json.dumps({"table": session.table.static_svg() + Physics.FOOTER,
+                                             "radius": Physics.BALL_RADIUS,
+                                             "colours": Physics.BALL_COLOURS}) + "\n")
+
+            count = 0
+            while True:
+                frame = frames.get()
+                if frame is None:
+                    break
+                if output == "data":
+                    self.write_chunk('{"frame":%d,"balls":%s}\n' % (count, json.dumps(frame, separators=(',', ':'))))
+                else:
+                    self.write_chunk(json.dumps({"frame": count, "svg": frame}) + "\n")
+                count += 1
+
+            end = {"done": True, "frames": count}
+            if shot.exception() is not None:
+                end["error"] = str(shot.exception())
+            self.write_chunk(json.dumps(end) + "\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except OSError:
+            # a closed, reset or timed out connection
+            self.close_connection = True
+            print("Client left while the shot was streaming")
+        finally:
+            # however the writer stops, the worker must not wait on a full queue
+            cancelled.set()
+
+    # sends the shot timings and the server's counters as JSON
+    def serve_metrics(self):
+        with self.server.sessions_lock:
+            sessions = len(self.server.sessions)
+        metrics = {
+            "timing": Physics.SHOT_METRICS,
+            "shots": Physics.SHOT_TOTALS.info(),
+            "shot_cache": self.server.shot_cache.info(),
+            "connections": dict(Physics.ConnectionPool.shared().stats),
+            "sessions": sessions,
+        }
+        self.serve_content(json.dumps(metrics), content_type="application/json")
+
+    # writes one chunk of a chunked response
+    def write_chunk(self, text):
+        data = text.encode('utf-8')
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
     def delete_existing_svg_files(self):
         directory = os.getcwd() # gets current working directory
         for file in os.listdir(directory):
             if file.startswith("table-") and file.endswith(".svg"):
                 os.remove(os.path.join(directory, file))
 
-    def serve_content(self, content, content_type="text/html", status_code=200):
+    def serve_content(self, content, content_type="text/html", status_code=200, etag=None):
+        self.send_body(content.encode('utf-8'), content_type, status_code, etag)
+
+    def send_body(self, content, content_type, status_code=200, etag=None, headers=None):
+        """
+        Sends a whole response with its Content-length, so the connection
+        can be used again. Text bodies of COMPRESS_MIN bytes or more are
+        sent gzip or deflate compressed if the client accepts either; with
+        an etag the compressed body is kept for the next request, under the
+        etag with the encoding added.
+        """
+        encoding = None
+        if len(content) >= COMPRESS_MIN and content_type.startswith(COMPRESSIBLE):
+            encoding = choose_encoding(self.headers.get('Accept-Encoding', ''))
+        if encoding is not None:
+            if etag is not None and COMPRESSED_CACHE_BYTES:
+                content = self.server.compressed.get(etag, encoding, content)
+            else:
+                content = compress(content, encoding)
+            if etag is not None:
+                etag = etag[:-1] + '-' + encoding + '"'
+
         self.send_response(status_code)
         self.send_header("Content-type", content_type)
         self.send_header("Content-length", str(len(content)))
+        if content_type.startswith(COMPRESSIBLE):
+            self.send_header("Vary", "Accept-Encoding")
+        if encoding is not None:
+            self.send_header("Content-Encoding", encoding)
+        if etag is not None:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
         self.end_headers()
-        self.wfile.write(content.encode())
-
-    # assigns players low and high
-    def set_player_and_ball(self, player1_name, player2_name):
-        global current_player, ball_set
-        if current_player is None or current_player == player2_name:
-            current_player = player1_name
-            ball_set = "low"
-        else:
-            current_player = player2_name
-            ball_set = "high"
+        self.wfile.write(content)
+
+    # answers 304 Not Modified and returns True if the client already has etag
+    def not_modified(self, etag):
+        # a compressed body's etag has its encoding added
+        for tag in self.headers.get('If-None-Match', '').split(','):
+            tag = tag.strip()
+            if tag == '*' or tag.replace('-gzip"', '"').replace('-deflate"', '"') == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag if tag == '*' else tag)
+                self.end_headers()
+                return True
+        return False
 
     def send_error_response(self, code, message):
         """
@@ -273,7 +687,8 @@ if __name__ == "__main__":
    
     db = Database(True) # creates an instance of database
     db.createDB() # creates the database
+    db.close() # gives the connection back for the handlers to reuse
      
-    httpd = HTTPServer(('localhost', int(sys.argv[1])), MyHandler)
+    httpd = EnhancedHTTPServer(('localhost', int(sys.argv[1])), MyHandler)
     print( "Server listing in port:  ", int(sys.argv[1]));
     httpd.serve_forever();
@@ -0,0 +1,52 @@
+"""
+Checks the shot planner plays shots with drag, so a soft shot comes up
+short, and that its kept outcomes are not shared between callers. Run with
+the phylib module built (make), from the top of the repository:
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+# Physics and phylib are built in the directory above this one
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+import Physics
+
+CUE = (Physics.TABLE_WIDTH / 2.0, Physics.TABLE_LENGTH - Physics.TABLE_WIDTH / 2.0)
+TARGET = (Physics.TABLE_WIDTH / 2.0, Physics.TABLE_WIDTH / 2.0)  # 1350 mm up the table from the cue ball
+SOFT_SPEED = 300.0  # mm/s, stops after 300 mm
+HARD_SPEED = 2000.0  # mm/s, reaches the target
+
+
+class PlanTest(unittest.TestCase):
+
+    def setUp(self):
+        table = Physics.Table.from_arrays([0, 1], [CUE, TARGET])
+        self.packed = Physics.pack_frame(table.roll_frames([0.0]).tolist()[0], 8)
+
+    def outcome(self, speed):
+        return Physics.plan_outcome(self.packed, 1, None, True, 0.0, -speed)
+
+    def test_soft_shot_comes_up_short(self):
+        outcome = self.outcome(SOFT_SPEED)
+        self.assertIsNone(outcome["contact"])
+        self.assertFalse(outcome["potted"])
+        self.assertEqual(outcome["events"], 1)  # the cue ball only stops
+        self.assertGreaterEqual(outcome["score"], Physics.FOUL_PENALTY)
+
+    def test_hard_shot_reaches_the_target(self):
+        self.assertEqual(self.outcome(HARD_SPEED)["contact"], 1)
+
+    def test_outcomes_are_not_shared(self):
+        first = self.outcome(SOFT_SPEED)
+        first["score"] = -1.0
+        first["potted"] = True
+        second = self.outcome(SOFT_SPEED)
+        self.assertIsNot(first, second)
+        self.assertGreaterEqual(second["score"], Physics.FOUL_PENALTY)
+        self.assertFalse(second["potted"])
+
+
+if __name__ == "__main__":
+    unittest.main()
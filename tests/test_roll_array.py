@@ -0,0 +1,62 @@
+"""
+Checks that Table.roll_array, the NumPy path, gives the frames phylib's
+roll_frames does. Run with the phylib module built (make), from the top of
+the repository:
+
+    python -m unittest discover tests
+"""
+import os
+import random
+import sys
+import unittest
+
+# Physics and phylib are built in the directory above this one
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+import Physics
+
+BREAK_VELOCITY = (0.0, -4000.0)  # straight up the table into the rack
+SEED = 2750  # a break that pots a ball
+TOLERANCE = 1e-9  # largest difference allowed in a position or velocity
+
+
+@unittest.skipIf(Physics.numpy is None, "roll_array needs numpy")
+class RollArrayTest(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(SEED)
+        table = Physics.Table().setup_pool_table()
+        table.strike(*BREAK_VELOCITY)
+        self.events = [table] + table.simulate(20000)
+
+    def assertSameFrames(self, table, times):
+        expected = Physics.numpy.asarray(table.roll_frames(times)).reshape(len(times), -1, Physics.FRAME_FIELDS)
+        frames = table.roll_array(times)
+        self.assertEqual(frames.shape, expected.shape)
+        # numbers and types exactly, positions and velocities within TOLERANCE
+        self.assertTrue((frames[:, :, 0] == expected[:, :, 0]).all())
+        self.assertTrue((frames[:, :, 3] == expected[:, :, 3]).all())
+        self.assertTrue(Physics.numpy.allclose(frames, expected, rtol=0.0, atol=TOLERANCE))
+
+    def test_break_has_rolling_still_and_potted_balls(self):
+        types = {row[0] for table in self.events for row in table.snapshot().tolist()}
+        self.assertIn(Physics.phylib.PHYLIB_ROLLING_BALL, types)
+        self.assertIn(Physics.phylib.PHYLIB_STILL_BALL, types)
+        balls = [len(table.snapshot()) for table in self.events]
+        self.assertLess(balls[-1], balls[0])
+
+    def test_matches_roll_frames_at_every_event(self):
+        for table, following in zip(self.events, self.events[1:]):
+            count = int((following.time - table.time) / Physics.FRAME_INTERVAL)
+            times = [i * Physics.FRAME_INTERVAL for i in range(count)]
+            if not times:
+                continue  # events closer together than a frame
+            with self.subTest(time=table.time):
+                self.assertSameFrames(table, times)
+
+    def test_matches_roll_frames_past_stopping(self):
+        # long enough for every rolling ball to stop, and a velocity to change sign
+        self.assertSameFrames(self.events[1], [0.0, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
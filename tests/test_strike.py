@@ -0,0 +1,60 @@
+"""
+Checks that Table.strike sets the cue ball rolling with drag, so a soft shot
+stops where drag stops it. Run with the phylib module built (make), from the
+top of the repository:
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+# Physics and phylib are built in the directory above this one
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+import Physics
+
+SOFT_SPEED = 300.0  # mm/s, far too slow to reach a cushion from the head spot
+TOLERANCE = 1.0  # mm the cue ball may stop from v^2 / (2 DRAG)
+
+
+class StrikeTest(unittest.TestCase):
+
+    def lone_cue_ball(self):
+        table = Physics.Table()
+        table += Physics.StillBall(0, Physics.Coordinate(Physics.TABLE_WIDTH / 2.0,
+                                                         Physics.TABLE_LENGTH - Physics.TABLE_WIDTH / 2.0))
+        return table
+
+    def test_strike_sets_drag_against_velocity(self):
+        table = self.lone_cue_ball()
+        ball = table.strike(0.0, -SOFT_SPEED).obj.rolling_ball
+        self.assertAlmostEqual(ball.acc.x, 0.0)
+        self.assertAlmostEqual(ball.acc.y, Physics.DRAG)
+
+    def test_bad_velocity_leaves_the_cue_ball(self):
+        table = self.lone_cue_ball()
+        for xvel, yvel in (("1", None), ("fast", 0.0), (float("nan"), 0.0), (0.0, float("inf"))):
+            with self.assertRaises((TypeError, ValueError)):
+                table.strike(xvel, yvel)
+            cue = table.cueBall()
+            self.assertIsNotNone(cue)
+            self.assertEqual(cue.type, Physics.phylib.PHYLIB_STILL_BALL)
+        self.assertEqual(len(table.snapshot()), 1)
+
+    def test_soft_strike_stops_after_drag_distance(self):
+        table = self.lone_cue_ball()
+        start = table.cueBall().obj.still_ball.pos.y
+        table.strike(0.0, -SOFT_SPEED)
+        events = table.simulate()
+
+        # the ball only slows to a stop, it hits nothing
+        self.assertEqual(len(events), 1)
+        self.assertAlmostEqual(events[-1].time, SOFT_SPEED / Physics.DRAG, places=3)
+        cue = events[-1].cueBall()
+        self.assertEqual(cue.type, Physics.phylib.PHYLIB_STILL_BALL)
+        travelled = start - cue.obj.still_ball.pos.y
+        self.assertAlmostEqual(travelled, SOFT_SPEED ** 2 / (2.0 * Physics.DRAG), delta=TOLERANCE)
+
+
+if __name__ == "__main__":
+    unittest.main()